@@ -1,18 +1,30 @@
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 import pandas as pd
 import plotly.express as px
 from datetime import datetime
 import os
+import threading
+from concurrent.futures import Future
 from dotenv import load_dotenv
-from utils.data_processing import load_data, preprocess_data, filter_data
+from utils.data_processing import load_data, load_data_chunked, preprocess_data, filter_data, FilterIndex
 from utils.visualization import (create_donut_chart, create_line_chart, create_bar_chart,
                                 create_histogram, create_scatter_plot, create_wordcloud, create_sunburst_chart)
 from utils.nlp_analysis import (analyze_sentiment, extract_themes, get_actionable_insights,
                                search_feedback, answer_custom_question)
 from utils.report_generation import generate_pdf_report
+from utils.summarization import summarize_feedback
+from utils.llm_gateway import cache_stats
+from utils.cache import AnalysisCache, hash_upload
+from utils.incremental import FeedbackStore
+from utils.retrieval import RetrievalIndex, load_or_build_index
+from utils.search import SearchIndex
+from utils.topic_model import ThemeDiscovery
+from utils.term_frequencies import TermFrequencies
+from utils.aggregation import DailyRollup, build_cube
 from utils.logging_config import setup_logging
+from utils.tracing import span, collect, in_context, profile, histogram_summary, prometheus_text, spans_to_jsonl
 import logging
-import time
 
 # Setup logging
 setup_logging()
@@ -22,6 +34,17 @@ logger = logging.getLogger(__name__)
 load_dotenv()
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 
+# Uploads larger than this are classified in chunks, so the classifiers never hold the whole file
+STREAMING_THRESHOLD_BYTES = int(os.getenv("STREAMING_THRESHOLD_BYTES", 50 * 1024 * 1024))
+
+# Start of the message answer_custom_question returns when the LLM call fails
+ANSWER_FAILURE = "Unable to answer the question due to an error"
+
+# Preprocessed uploads are cached on disk so reruns skip classification
+analysis_cache = AnalysisCache()
+# Cumulative exports in append mode only classify rows not seen before
+feedback_store = FeedbackStore()
+
 # Streamlit page configuration
 st.set_page_config(page_title="Customer Feedback Synthesizer", layout="wide", initial_sidebar_state="expanded")
 
@@ -86,7 +109,202 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-def main():
+# The dashboard is a graph of derived artifacts: dataset -> indexes and daily rollup -> filtered view -> cube ->
+# figures and word clouds, and filtered view -> insights and answers. Each node below is memoized
+# on the keys of its inputs, so a rerun only recomputes the nodes downstream of what changed.
+# Large read-only objects (frames, indexes) are shared through st.cache_resource; small results go
+# through st.cache_data. Arguments starting with an underscore are the objects behind a key and are
+# not hashed. A filtered view is keyed by `view`: (dataset_key, date_range, sentiments, themes, query).
+INDEX_CLASSES = {'retrieval': RetrievalIndex, 'search': SearchIndex, 'topics': ThemeDiscovery,
+                 'terms': TermFrequencies, 'rollup': DailyRollup}
+# One upload and the stored history can be open at once; larger datasets should not pile up in memory
+OPEN_DATASETS = 2
+
+class NotCached(Exception):
+    """Carries a node's result out without memoizing it, e.g. an LLM error message."""
+
+def uncached_errors(node, *args):
+    """Call a memoized node, returning results it refused to cache."""
+    try:
+        return node(*args)
+    except NotCached as e:
+        return e.args[0]
+
+def submit_node(node, *args):
+    """Run a memoized LLM node on its own thread and return a Future.
+
+    Streamlit's caches find the session through the ScriptRunContext, which is
+    attached before the thread starts; shared pool threads cannot carry it.
+    The requests still share the gateway's pooled client.
+    """
+    future = Future()
+
+    def run():
+        try:
+            future.set_result(uncached_errors(node, *args))
+        except Exception as e:
+            future.set_exception(e)
+
+    thread = threading.Thread(target=in_context(run), name=f"llm-{node.__name__}", daemon=True)
+    add_script_run_ctx(thread, get_script_run_ctx())
+    thread.start()
+    return future
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def upload_key(file_id, _uploaded_file):
+    """Content hash of an upload, computed once per uploaded file."""
+    return hash_upload(_uploaded_file)
+
+def load_upload(dataset_key, uploaded_file):
+    """Read a preprocessed upload from the analysis cache, preprocessing it on a miss."""
+    df = analysis_cache.get(dataset_key)
+    if df is None:
+        if uploaded_file.size > STREAMING_THRESHOLD_BYTES:
+            df = load_data_chunked(uploaded_file)
+        else:
+            df = load_data(uploaded_file)
+            df = preprocess_data(df)
+        analysis_cache.put(dataset_key, df)
+        # Persist the daily rollup at ingestion so trend and filter views never regroup the rows
+        load_or_build_index(analysis_cache, dataset_key, df, index_cls=DailyRollup)
+        prebuild_retrieval_index(dataset_key, df)
+    return df
+
+def load_history(dataset_key, base_keys):
+    """Read the stored history, extending its retrieval index with rows appended since the last version."""
+    df = feedback_store.load()
+    if len(df):
+        prebuild_retrieval_index(dataset_key, df, base_keys)
+    return df
+
+def prebuild_retrieval_index(dataset_key, df, base_keys=()):
+    """Persist the retrieval index at ingestion so the first question does not pay for the TF-IDF fit."""
+    try:
+        load_or_build_index(analysis_cache, dataset_key, df['feedback'], index_cls=RetrievalIndex, base_keys=base_keys)
+    except Exception as e:
+        # e.g. no indexable words; the first question retries and reports the error
+        logger.error(f"Error building retrieval index for {dataset_key[:12]}: {str(e)}")
+
+@st.cache_resource(show_spinner=False, max_entries=OPEN_DATASETS)
+def dataset(dataset_key, _load):
+    """The preprocessed dataset behind a key; `_load` produces it on a miss."""
+    return _load()
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def dataset_options(dataset_key, _df):
+    """Date bounds and the sentiment and theme values offered by the filters."""
+    return (_df['date'].min().date(), _df['date'].max().date(),
+            list(_df['sentiment'].unique()), list(_df['theme'].unique()))
+
+# The filter index plus every persisted kind, for each open dataset
+@st.cache_resource(show_spinner=False, max_entries=(1 + len(INDEX_CLASSES)) * OPEN_DATASETS)
+def dataset_index(dataset_key, name, _df, _base_keys=()):
+    """Filter, search, retrieval, topic, term or rollup index of a dataset, loaded or built on first use.
+
+    `_base_keys` are earlier versions of the stored history, whose indexes are extended with the new rows.
+    """
+    if name == 'filter':
+        return FilterIndex(_df)
+    index_cls = INDEX_CLASSES[name]
+    data = _df if index_cls in (TermFrequencies, DailyRollup) else _df['feedback']
+    return load_or_build_index(analysis_cache, dataset_key, data, index_cls=index_cls, base_keys=_base_keys)
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def filtered_view(view, _df, _filter_index, _search_index):
+    """Rows of the dataset matching the filters and search query of `view`."""
+    _, date_range, sentiments, themes, query = view
+    filtered_df = filter_data(_df, date_range, list(sentiments), list(themes), index=_filter_index)
+    if query:
+        filtered_df = search_feedback(filtered_df, query, index=_search_index)
+    return filtered_df
+
+@st.cache_resource(show_spinner=False, max_entries=OPEN_DATASETS)
+def dataset_rollup(dataset_key, _df, _store=None):
+    """Daily (day, theme, sentiment) counts of a whole dataset.
+
+    `_store` serves the running cube of the stored history; uploads use their persisted DailyRollup.
+    """
+    if _store is not None:
+        return _store.cube()
+    return dataset_index(dataset_key, 'rollup', _df).cube
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def view_cube(view, _filtered_df, _rollup):
+    """Counts per day, theme and sentiment of a view.
+
+    Date, sentiment and theme filters slice the dataset's daily rollup; only
+    search results, an arbitrary set of rows, are aggregated from the rows.
+    """
+    _, date_range, sentiments, themes, query = view
+    if query:
+        return build_cube(_filtered_df)
+    return filter_data(_rollup, date_range, list(sentiments), list(themes)).reset_index(drop=True)
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def view_figures(view, _cube):
+    """The donut, bar, histogram and sunburst charts of a view."""
+    return create_donut_chart(_cube), create_bar_chart(_cube), create_histogram(_cube), create_sunburst_chart(_cube)
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def view_trend(view, resolution, rolling, _cube):
+    """The sentiment trend of a view at a resolution, optionally as a rolling average."""
+    return create_line_chart(_cube, resolution=resolution, rolling=rolling)
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def view_scatter(view, recency_half_life_days, show_confidence, _cube):
+    """The priority matrix of a view for the chosen weighting options."""
+    return create_scatter_plot(_cube, recency_half_life_days=recency_half_life_days or None,
+                               show_confidence=show_confidence)
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def view_wordclouds(view, _filtered_df, _term_frequencies):
+    """Positive and negative word clouds of a view.
+
+    Term counts come from the precomputed tables; search results sum their own rows.
+    """
+    _, date_range, sentiments, themes, query = view
+    rows = _filtered_df.index.to_numpy() if query else None
+    return create_wordcloud(_filtered_df, frequencies=tuple(
+        _term_frequencies.frequencies(sentiment, date_range, list(sentiments), list(themes), rows=rows)
+        for sentiment in ('Positive', 'Negative')))
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def view_summary(view, _filtered_df):
+    """Summary of a view's feedback shared by its insights and answers; None if it failed.
+
+    Insights and answers run side by side; Streamlit computes a missing entry
+    once and makes concurrent callers wait for it, so each segment is
+    summarized a single time. Token usage is attached to the span.
+    """
+    with span("app.view_summary") as current:
+        try:
+            summary, usage = summarize_feedback(_filtered_df, GROQ_API_KEY)
+        except Exception as e:
+            logger.error(f"Error summarizing feedback: {str(e)}")
+            raise NotCached(None)
+        current.set(llm_calls=usage.calls, prompt_tokens=usage.prompt_tokens,
+                    completion_tokens=usage.completion_tokens)
+    return summary
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def view_insights(view, _filtered_df):
+    """LLM insights for a view; failures are shown but not memoized."""
+    summary = uncached_errors(view_summary, view, _filtered_df)
+    insights = get_actionable_insights(_filtered_df, GROQ_API_KEY, summary=summary)
+    if "Unable to generate insights" in insights:
+        raise NotCached(insights)
+    return insights
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def view_answer(view, question, _filtered_df, _retrieval_index):
+    """LLM answer to a question about a view; failures are shown but not memoized."""
+    summary = uncached_errors(view_summary, view, _filtered_df)
+    answer = answer_custom_question(_filtered_df, question, GROQ_API_KEY, index=_retrieval_index, summary=summary)
+    if answer.startswith(ANSWER_FAILURE):
+        raise NotCached(answer)
+    return answer
+
+def render_dashboard():
     # Header
     st.markdown("<h1 class='title'>Customer Feedback Synthesizer for Retail</h1>", unsafe_allow_html=True)
     
@@ -94,34 +312,46 @@ def main():
     with st.sidebar:
         st.header("Upload & Filters", anchor=False)
         uploaded_file = st.file_uploader("Upload CSV file", type=["csv"], help="Upload a CSV with 'feedback' and 'date' columns.")
+        append_mode = st.checkbox("Append to stored history", help="Add only the new rows of a cumulative export to the stored history and analyze the whole history.")
         
         if uploaded_file:
             try:
                 with st.spinner("Loading data..."):
-                    start_time = time.time()
-                    df = load_data(uploaded_file)
-                    df = preprocess_data(df)
-                    logger.info(f"Data loaded and preprocessed in {time.time() - start_time:.2f} seconds")
+                    with span("app.load_dataset", append=append_mode) as load_span:
+                        key = upload_key(uploaded_file.file_id, uploaded_file)
+                        if append_mode:
+                            if st.session_state.get('appended_upload_key') != key:
+                                new_rows = feedback_store.append(load_data(uploaded_file))
+                                st.session_state['appended_upload_key'] = key
+                                logger.info(f"Appended {new_rows} new rows to the stored history")
+                            else:
+                                # Other sessions or batch runs may have appended since
+                                feedback_store.refresh()
+                            dataset_key = feedback_store.key()
+                            base_keys = tuple(feedback_store.history())
+                            df = dataset(dataset_key, lambda: load_history(dataset_key, base_keys))
+                        else:
+                            dataset_key = key
+                            base_keys = ()
+                            df = dataset(dataset_key, lambda: load_upload(dataset_key, uploaded_file))
+                        load_span.set(rows_out=len(df))
+                    if df.empty:
+                        st.warning("The stored history has no rows yet." if append_mode else "The uploaded file has no rows.")
+                        return
+                    min_date, max_date, all_sentiments, all_themes = dataset_options(dataset_key, df)
                     
                     # Date range filter
-                    min_date = df['date'].min().date()
-                    max_date = df['date'].max().date()
                     date_range = st.date_input("Select Date Range", [min_date, max_date], min_value=min_date, max_value=max_date)
                     
                     # Sentiment filter (multi-select)
-                    sentiments = ['All'] + list(df['sentiment'].unique())
-                    selected_sentiments = st.multiselect("Select Sentiments", sentiments, default=['All'])
+                    selected_sentiments = st.multiselect("Select Sentiments", ['All'] + all_sentiments, default=['All'])
                     if 'All' in selected_sentiments:
-                        selected_sentiments = list(df['sentiment'].unique())
+                        selected_sentiments = all_sentiments
                     
                     # Theme filter (multi-select)
-                    themes = ['All'] + list(df['theme'].unique())
-                    selected_themes = st.multiselect("Select Themes", themes, default=['All'])
+                    selected_themes = st.multiselect("Select Themes", ['All'] + all_themes, default=['All'])
                     if 'All' in selected_themes:
-                        selected_themes = list(df['theme'].unique())
-                    
-                    # Apply filters
-                    filtered_df = filter_data(df, date_range, selected_sentiments, selected_themes)
+                        selected_themes = all_themes
             except Exception as e:
                 st.error(f"Error loading data: {str(e)}")
                 logger.error(f"Error loading data: {str(e)}")
@@ -134,24 +364,40 @@ def main():
     if uploaded_file:
         with st.container():
             # Search bar
-            search_query = st.text_input("Search Feedback", placeholder="Enter keywords to search feedback...")
-            if search_query:
-                filtered_df = search_feedback(filtered_df, search_query)
+            search_query = st.text_input("Search Feedback", placeholder='Enter keywords, e.g. refund OR return, "long wait", deliver*')
+
+            # Apply filters and search
+            view = (dataset_key, tuple(date_range), tuple(selected_sentiments), tuple(selected_themes), search_query)
+            search_index = dataset_index(dataset_key, 'search', df, base_keys) if search_query else None
+            filtered_df = filtered_view(view, df, dataset_index(dataset_key, 'filter', df), search_index)
             
             # Custom question
             st.markdown("<h2 class='subheader'>Ask a Question</h2>", unsafe_allow_html=True)
             with st.container():
                 st.markdown("<div class='card'>", unsafe_allow_html=True)
                 custom_question = st.text_input("Ask a Question About the Feedback", placeholder="e.g., What are common service complaints?", key="custom-question")
+
+                # Start both LLM requests now so they run side by side over the pooled client
+                insights_future = submit_node(view_insights, view, filtered_df)
+                answer_future = None
+                if custom_question:
+                    answer_future = submit_node(view_answer, view, custom_question, filtered_df,
+                                                dataset_index(dataset_key, 'retrieval', df, base_keys))
+
                 if custom_question:
                     with st.spinner("Generating answer..."):
-                        answer = answer_custom_question(filtered_df, custom_question, GROQ_API_KEY)
-                        if "error" in answer.lower():
+                        answer = answer_future.result()
+                        if answer.startswith(ANSWER_FAILURE):
                             st.error(answer)
                         else:
                             st.markdown(f"<strong>Answer:</strong> {answer}", unsafe_allow_html=True)
                 st.markdown("</div>", unsafe_allow_html=True)
 
+            # Aggregate once per view; every chart renders from the cube
+            rollup = dataset_rollup(dataset_key, df, feedback_store if append_mode else None)
+            cube = view_cube(view, filtered_df, rollup)
+            donut_fig, bar_fig, hist_fig, sunburst_fig = view_figures(view, cube)
+
             # Dashboard layout
             col1, col2 = st.columns([2, 1])
             
@@ -160,7 +406,6 @@ def main():
                 st.markdown("<h2 class='subheader'>Sentiment Distribution</h2>", unsafe_allow_html=True)
                 with st.container():
                     st.markdown("<div class='card'>", unsafe_allow_html=True)
-                    donut_fig = create_donut_chart(filtered_df)
                     st.plotly_chart(donut_fig, use_container_width=True)
                     st.markdown("</div>", unsafe_allow_html=True)
                 
@@ -168,7 +413,11 @@ def main():
                 st.markdown("<h2 class='subheader'>Sentiment Trend Over Time</h2>", unsafe_allow_html=True)
                 with st.container():
                     st.markdown("<div class='card'>", unsafe_allow_html=True)
-                    line_fig = create_line_chart(filtered_df)
+                    trend_col1, trend_col2 = st.columns(2)
+                    resolution = trend_col1.selectbox("Resolution", ['Auto', 'Day', 'Week', 'Month'],
+                                                      help="Auto picks days, weeks or months from the width of the date range.")
+                    rolling = trend_col2.number_input("Rolling average over periods (0 = off)", min_value=0, value=0, step=1)
+                    line_fig = view_trend(view, resolution.lower(), rolling, cube)
                     st.plotly_chart(line_fig, use_container_width=True)
                     st.markdown("</div>", unsafe_allow_html=True)
                 
@@ -176,7 +425,6 @@ def main():
                 st.markdown("<h2 class='subheader'>Theme Distribution</h2>", unsafe_allow_html=True)
                 with st.container():
                     st.markdown("<div class='card'>", unsafe_allow_html=True)
-                    bar_fig = create_bar_chart(filtered_df)
                     st.plotly_chart(bar_fig, use_container_width=True)
                     st.markdown("</div>", unsafe_allow_html=True)
 
@@ -185,7 +433,7 @@ def main():
                 st.markdown("<h2 class='subheader'>Word Clouds</h2>", unsafe_allow_html=True)
                 with st.container():
                     st.markdown("<div class='card'>", unsafe_allow_html=True)
-                    pos_wc, neg_wc = create_wordcloud(filtered_df)
+                    pos_wc, neg_wc = view_wordclouds(view, filtered_df, dataset_index(dataset_key, 'terms', df, base_keys))
                     st.image(pos_wc, caption="Positive Feedback Word Cloud", use_column_width=True)
                     st.image(neg_wc, caption="Negative Feedback Word Cloud", use_column_width=True)
                     st.markdown("</div>", unsafe_allow_html=True)
@@ -195,7 +443,7 @@ def main():
                 with st.container():
                     st.markdown("<div class='card'>", unsafe_allow_html=True)
                     with st.spinner("Generating insights..."):
-                        insights = get_actionable_insights(filtered_df, GROQ_API_KEY)
+                        insights = insights_future.result()
                     st.markdown(insights, unsafe_allow_html=True)
                     st.markdown("</div>", unsafe_allow_html=True)
 
@@ -203,21 +451,22 @@ def main():
             st.markdown("<h2 class='subheader'>Sentiment per Theme (Histogram)</h2>", unsafe_allow_html=True)
             with st.container():
                 st.markdown("<div class='card'>", unsafe_allow_html=True)
-                hist_fig = create_histogram(filtered_df)
                 st.plotly_chart(hist_fig, use_container_width=True)
                 st.markdown("</div>", unsafe_allow_html=True)
             
             st.markdown("<h2 class='subheader'>Priority Matrix (Scatter Plot)</h2>", unsafe_allow_html=True)
             with st.container():
                 st.markdown("<div class='card'>", unsafe_allow_html=True)
-                scatter_fig = create_scatter_plot(filtered_df)
+                option_col1, option_col2 = st.columns(2)
+                recency_half_life = option_col1.number_input("Recency half-life in days (0 = unweighted)", min_value=0, value=0, step=7)
+                show_confidence = option_col2.checkbox("Show 95% confidence intervals")
+                scatter_fig = view_scatter(view, recency_half_life, show_confidence, cube)
                 st.plotly_chart(scatter_fig, use_container_width=True)
                 st.markdown("</div>", unsafe_allow_html=True)
             
             st.markdown("<h2 class='subheader'>Sentiment by Theme (Sunburst Chart)</h2>", unsafe_allow_html=True)
             with st.container():
                 st.markdown("<div class='card'>", unsafe_allow_html=True)
-                sunburst_fig = create_sunburst_chart(filtered_df)
                 st.plotly_chart(sunburst_fig, use_container_width=True)
                 st.markdown("</div>", unsafe_allow_html=True)
             
@@ -240,13 +489,12 @@ def main():
                 if st.button("Generate and Download Report", key="download-report-button", use_container_width=True):
                     with st.spinner("Generating PDF report..."):
                         try:
-                            start_time = time.time()
                             # Debug the themes variable before passing it
                             themes = extract_themes(filtered_df)
                             logger.debug(f"Type of themes before report generation: {type(themes)}, Value: {themes}")
                             pdf_buffer = generate_pdf_report(filtered_df, donut_fig, line_fig, bar_fig, hist_fig, 
-                                               scatter_fig, sunburst_fig, pos_wc, neg_wc, themes, insights)
-                            logger.info(f"PDF generated in {time.time() - start_time:.2f} seconds")
+                                               scatter_fig, sunburst_fig, pos_wc, neg_wc, themes, insights,
+                                               discovered_themes=dataset_index(dataset_key, 'topics', df, base_keys).themes())
                             st.download_button(
                                 label="Click to Download Report",
                                 data=pdf_buffer,
@@ -261,5 +509,40 @@ def main():
                             logger.error(f"Failed to generate report: {str(e)}")
                 st.markdown("</div>", unsafe_allow_html=True)
 
+def render_performance_panel(spans, profiled):
+    """Show where the time of this run went, plus latency histograms across runs."""
+    with st.expander("⏱️ Performance of this run"):
+        if spans:
+            breakdown = pd.DataFrame([s.to_dict() for s in sorted(spans, key=lambda s: s.start)])
+            breakdown['stage'] = ['\u2003' * depth + name for depth, name in zip(breakdown['depth'], breakdown['name'])]
+            breakdown['ms'] = (breakdown.pop('seconds') * 1000).round(1)
+            columns = ['stage', 'ms'] + [c for c in ('rows_in', 'rows_out', 'bytes_in', 'bytes_out', 'cached',
+                                                     'llm_calls', 'prompt_tokens', 'completion_tokens', 'thread')
+                                         if c in breakdown]
+            st.dataframe(breakdown[columns], hide_index=True, use_container_width=True)
+            st.download_button("Download spans (JSON lines)", spans_to_jsonl(spans), file_name="spans.jsonl",
+                               mime="application/json")
+        st.markdown("<strong>Stage latency across runs</strong>", unsafe_allow_html=True)
+        st.dataframe(pd.DataFrame(histogram_summary()), hide_index=True, use_container_width=True)
+        st.download_button("Download metrics (Prometheus)", prometheus_text(), file_name="metrics.prom", mime="text/plain")
+        llm_cache = cache_stats()
+        if llm_cache is not None:
+            st.markdown("<strong>LLM response cache</strong>", unsafe_allow_html=True)
+            st.dataframe(pd.DataFrame([llm_cache]), hide_index=True, use_container_width=True)
+        st.multiselect("Profile the next run", ['cprofile', 'tracemalloc'], key='profile_modes',
+                       help="cProfile adds noticeable overhead; tracemalloc slows allocations heavily.")
+        if profiled.skipped:
+            st.info("Another session was being profiled, so this run was not; try again shortly.")
+        if profiled.cprofile:
+            st.code(profiled.cprofile, language=None)
+        if profiled.tracemalloc:
+            st.code(profiled.tracemalloc, language=None)
+
+def main():
+    with collect() as spans, profile(st.session_state.get('profile_modes') or None) as profiled:
+        with span("app.run"):
+            render_dashboard()
+    render_performance_panel(spans, profiled)
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
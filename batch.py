@@ -0,0 +1,163 @@
+"""Headless batch runner: python batch.py FILE_OR_DIR [...] --output-dir reports
+
+Runs load -> preprocess -> aggregate -> PDF report for each CSV without
+Streamlit, one file per worker process, and prints a JSON summary. The exit
+code is 0 when every file succeeded, 1 when some failed or an input path does
+not exist and 2 when no input CSV was found.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+NO_INSIGHTS = "<ul><li>Insights were not generated for this batch run.</li></ul>"
+
+def find_inputs(paths):
+    """Expand files and directories into a sorted, de-duplicated list of CSV paths.
+
+    Returns (found CSV paths, given paths that do not exist).
+    """
+    found = set()
+    missing = []
+    for path in paths:
+        if os.path.isdir(path):
+            for name in os.listdir(path):
+                if name.lower().endswith('.csv'):
+                    found.add(os.path.join(path, name))
+        elif os.path.isfile(path):
+            found.add(path)
+        else:
+            logger.error(f"Input not found: {path}")
+            missing.append(path)
+    return sorted(found), missing
+
+def output_stems(paths):
+    """Map each input path to a distinct stem for its output files.
+
+    Inputs sharing a file name (compared case-insensitively) are prefixed
+    with their parent directory's name, and numbered if that still collides,
+    so parallel workers never write the same report or aggregate file.
+    """
+    stems = {path: os.path.splitext(os.path.basename(path))[0] for path in paths}
+    shared = Counter(stem.lower() for stem in stems.values())
+    taken = {stem.lower() for stem in stems.values() if shared[stem.lower()] == 1}
+    result = {}
+    for path in paths:
+        stem = stems[path]
+        if shared[stem.lower()] > 1:
+            parent = os.path.basename(os.path.dirname(os.path.abspath(path)))
+            base = stem = f"{parent}_{stem}" if parent else stem
+            number = 2
+            while stem.lower() in taken:
+                stem = f"{base}_{number}"
+                number += 1
+            taken.add(stem.lower())
+        result[path] = stem
+    return result
+
+def process_file(path, output_dir, with_insights=False, renderer_name=None, stem=None):
+    """Build the aggregates and PDF report for one CSV and return a summary dict.
+
+    Output files are named after `stem` (the input's file name by default).
+    """
+    from utils.aggregation import build_cube, priority_matrix
+    from utils.data_processing import load_data, preprocess_data
+    from utils.nlp_analysis import extract_themes, get_actionable_insights
+    from utils.report_generation import generate_pdf_report
+    from utils.topic_model import ThemeDiscovery
+    from utils.visualization import (create_donut_chart, create_line_chart, create_bar_chart, create_histogram,
+                                     create_scatter_plot, create_sunburst_chart, create_wordcloud)
+
+    start_time = time.time()
+    stem = stem or os.path.splitext(os.path.basename(path))[0]
+    summary = {'input': path, 'status': 'ok'}
+    try:
+        df = preprocess_data(load_data(path))
+        cube = build_cube(df)
+        cube_path = os.path.join(output_dir, f"{stem}_cube.csv")
+        priority_path = os.path.join(output_dir, f"{stem}_priority.csv")
+        cube.to_csv(cube_path, index=False)
+        priority_matrix(cube).to_csv(priority_path, index=False)
+
+        charts = [create_donut_chart(cube), create_line_chart(cube), create_bar_chart(cube), create_histogram(cube),
+                  create_scatter_plot(cube), create_sunburst_chart(cube)]
+        pos_wc, neg_wc = create_wordcloud(df)
+        api_key = os.getenv("GROQ_API_KEY")
+        insights = get_actionable_insights(df, api_key) if with_insights and api_key else NO_INSIGHTS
+        # Files already run in parallel, so each one renders its charts on a single thread
+        pdf_buffer = generate_pdf_report(df, *charts, pos_wc, neg_wc, extract_themes(df), insights,
+                                         renderer_name=renderer_name, render_workers=1, render_executor='thread',
+                                         discovered_themes=ThemeDiscovery.build(df['feedback']).themes())
+        report_path = os.path.join(output_dir, f"{stem}_report.pdf")
+        with open(report_path, 'wb') as f:
+            f.write(pdf_buffer.getvalue())
+        summary.update({
+            'rows': len(df),
+            'sentiment_counts': {str(k): int(v) for k, v in cube.groupby('sentiment', observed=True)['count'].sum().items()},
+            'report': report_path,
+            'cube': cube_path,
+            'priority_matrix': priority_path,
+        })
+    except Exception as e:
+        logger.error(f"Error processing {path}: {str(e)}")
+        summary.update({'status': 'error', 'error': str(e)})
+    summary['seconds'] = round(time.time() - start_time, 2)
+    return summary
+
+def run(paths, output_dir, workers=None, with_insights=False, renderer_name=None):
+    """Process every input CSV across a pool of worker processes; return the summaries in input order."""
+    os.makedirs(output_dir, exist_ok=True)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(paths) or 1))
+    stems = output_stems(paths)
+    summaries = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(process_file, path, output_dir, with_insights, renderer_name, stems[path]): path
+                   for path in paths}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                summaries[path] = future.result()
+            except Exception as e:
+                # The worker itself died (e.g. out of memory)
+                logger.error(f"Worker failed on {path}: {str(e)}")
+                summaries[path] = {'input': path, 'status': 'error', 'error': str(e)}
+            logger.info(f"Finished {path}: {summaries[path]['status']}")
+    return [summaries[path] for path in paths]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate feedback reports and aggregates without the dashboard.")
+    parser.add_argument('inputs', nargs='+', help="CSV files or directories containing CSV files")
+    parser.add_argument('-o', '--output-dir', default='reports', help="directory for reports and aggregates (default: reports)")
+    parser.add_argument('-w', '--workers', type=int, default=None, help="parallel worker processes (default: CPU count)")
+    parser.add_argument('--insights', action='store_true', help="generate LLM insights (needs GROQ_API_KEY)")
+    parser.add_argument('--renderer', default=None, help="chart renderer: matplotlib, kaleido or selenium")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+                        stream=sys.stderr)
+    start_time = time.time()
+    paths, missing = find_inputs(args.inputs)
+    summaries = run(paths, args.output_dir, args.workers, args.insights, args.renderer) if paths else []
+    summaries += [{'input': path, 'status': 'error', 'error': 'input not found'} for path in missing]
+    failed = sum(summary['status'] != 'ok' for summary in summaries)
+    print(json.dumps({
+        'files': len(summaries),
+        'succeeded': len(summaries) - failed,
+        'failed': failed,
+        'seconds': round(time.time() - start_time, 2),
+        'results': summaries,
+    }, indent=2))
+    if not paths and not missing:
+        return 2
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
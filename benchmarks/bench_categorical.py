@@ -0,0 +1,77 @@
+"""Benchmark object vs categorical sentiment/theme columns.
+
+Run from the repository root:
+    python -m benchmarks.bench_categorical --rows 1000000
+"""
+import argparse
+import datetime
+import time
+import numpy as np
+import pandas as pd
+from utils.data_processing import filter_data
+from utils.nlp_analysis import SENTIMENT_LABELS, THEME_KEYWORDS
+
+def make_frame(rows, seed=0):
+    """Build a synthetic preprocessed frame with categorical labels."""
+    rng = np.random.default_rng(seed)
+    themes = list(THEME_KEYWORDS) + ['General']
+    date = pd.Timestamp('2023-01-01') + pd.to_timedelta(rng.integers(0, 730 * 24, size=rows), unit='h')
+    return pd.DataFrame({
+        'date': date,
+        'day': date.normalize(),
+        'feedback': 'synthetic feedback',
+        'sentiment': pd.Categorical.from_codes(rng.integers(0, len(SENTIMENT_LABELS), size=rows), categories=SENTIMENT_LABELS),
+        'theme': pd.Categorical.from_codes(rng.integers(0, len(themes), size=rows), categories=themes),
+    })
+
+def filter_data_legacy(df, date_range, sentiments, themes):
+    """Original object-column filter, kept as the baseline."""
+    filtered_df = df.copy()
+    if len(date_range) == 2:
+        filtered_df = filtered_df[(filtered_df['date'].dt.date >= date_range[0]) &
+                                (filtered_df['date'].dt.date <= date_range[1])]
+    if sentiments:
+        filtered_df = filtered_df[filtered_df['sentiment'].isin(sentiments)]
+    if themes:
+        filtered_df = filtered_df[filtered_df['theme'].isin(themes)]
+    return filtered_df
+
+def timed(func, *args):
+    """Return (seconds, result) for a single call."""
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+def aggregate(df, day_column):
+    """Run the aggregations the dashboard charts perform."""
+    df['sentiment'].value_counts()
+    df['theme'].value_counts()
+    df.groupby([day_column, 'sentiment'], observed=True).size()
+    df.groupby(['theme', 'sentiment'], observed=True).size()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    after = make_frame(args.rows)
+    before = after.drop(columns='day').astype({'sentiment': object, 'theme': object})
+    date_range = [datetime.date(2023, 3, 1), datetime.date(2024, 3, 1)]
+    sentiments = ['Positive', 'Negative']
+    themes = ['Service', 'Store', 'General']
+
+    label_bytes_before = before[['sentiment', 'theme']].memory_usage(deep=True, index=False).sum()
+    label_bytes_after = after[['sentiment', 'theme']].memory_usage(deep=True, index=False).sum()
+    filter_before, filtered_before = timed(filter_data_legacy, before, date_range, sentiments, themes)
+    filter_after, filtered_after = timed(filter_data, after, date_range, sentiments, themes)
+    assert filtered_before.index.equals(filtered_after.index), "Filters disagree"
+    aggregate_before, _ = timed(aggregate, before.assign(day=before['date'].dt.date), 'day')
+    aggregate_after, _ = timed(aggregate, after, 'day')
+
+    print(f"rows:              {args.rows:,}")
+    print(f"label memory:      {label_bytes_before / 1e6:8.1f} MB -> {label_bytes_after / 1e6:8.1f} MB")
+    print(f"filter_data:       {filter_before:8.3f} s  -> {filter_after:8.3f} s")
+    print(f"chart aggregation: {aggregate_before:8.3f} s  -> {aggregate_after:8.3f} s")
+
+if __name__ == "__main__":
+    main()
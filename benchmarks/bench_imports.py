@@ -0,0 +1,75 @@
+"""Benchmark cold import time of the utils modules.
+
+Run from the repository root:
+    python -m benchmarks.bench_imports --max-seconds 1.5
+
+Each module is imported in a fresh interpreter. The run fails (exit code 1)
+if a heavy optional dependency is loaded at import time or, with
+--max-seconds, if any module takes longer than the budget.
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+MODULES = [
+    'utils.data_processing',
+    'utils.nlp_analysis',
+    'utils.cache',
+    'utils.aggregation',
+    'utils.llm_gateway',
+    'utils.visualization',
+    'utils.chart_rendering',
+    'utils.report_generation',
+    'utils.persisted_index',
+    'utils.retrieval',
+    'utils.search',
+    'utils.topic_model',
+    'utils.term_frequencies',
+    'utils.incremental',
+    'utils.tracing',
+]
+
+# Only loaded on first use: LLM calls, text indexes, word clouds and chart rendering backends
+DEFERRED_DEPENDENCIES = ['groq', 'httpx', 'nltk', 'sklearn', 'scipy', 'joblib', 'wordcloud', 'matplotlib',
+                         'selenium', 'webdriver_manager', 'kaleido', 'streamlit']
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print(json.dumps({{'seconds': seconds, 'loaded': [m for m in {deferred!r} if m in sys.modules]}}))
+"""
+
+def measure(module, repeat):
+    """Return (best import seconds over `repeat` fresh interpreters, deferred modules it loaded)."""
+    best, loaded = float('inf'), []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', PROBE.format(module=module, deferred=DEFERRED_DEPENDENCIES)],
+                                capture_output=True, text=True, check=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        best = min(best, result['seconds'])
+        loaded = result['loaded']
+    return best, loaded
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--max-seconds', type=float, default=None, help="fail if any module imports slower than this")
+    args = parser.parse_args()
+
+    failures = []
+    for module in MODULES:
+        seconds, loaded = measure(module, args.repeat)
+        print(f"{module:<28} {seconds:.3f}s" + (f"  loads {', '.join(loaded)}" if loaded else ""))
+        if loaded:
+            failures.append(f"{module} imports {', '.join(loaded)} eagerly")
+        if args.max_seconds is not None and seconds > args.max_seconds:
+            failures.append(f"{module} took {seconds:.3f}s (budget {args.max_seconds:.3f}s)")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
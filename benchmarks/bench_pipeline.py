@@ -0,0 +1,321 @@
+"""Benchmark every pipeline stage on synthetic feedback.
+
+Run from the repository root:
+    python -m benchmarks.bench_pipeline --rows 10000 100000 1000000 10000000 -o before.json
+    python -m benchmarks.bench_pipeline --rows 10000 100000 1000000 10000000 --compare before.json
+
+Each row count runs in a fresh interpreter, so peak RSS is measured per size
+and stage. The Groq API is replaced by a local stub server and report charts
+by a stub renderer, so the run needs no network, API key or browser. Results
+(seconds, rows per second and peak RSS per stage) are written as JSON; with
+--compare the run fails (exit code 1) if a stage got slower than --threshold
+times its previous time (by more than 10 ms).
+"""
+import argparse
+import datetime
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from benchmarks.synthetic import add_generator_arguments, generate_feedback, generator_options, write_csv
+
+STAGES = ['load', 'preprocess', 'filter_index', 'filter', 'cube', 'charts', 'term_frequencies', 'wordcloud',
+          'search_index', 'search', 'retrieval_index', 'topic_model', 'insights', 'report']
+DEFAULT_ROWS = [10_000, 100_000, 1_000_000, 10_000_000]
+STUB_COMPLETION = "- Retrain checkout staff\n- Restock popular sizes\n- Fix delivery packaging"
+RSS_SAMPLE_SECONDS = 0.005
+# Slowdowns smaller than this are timer noise, whatever the ratio
+NOISE_FLOOR_SECONDS = 0.01
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    """Answers every chat completion with a fixed reply after `latency` seconds."""
+
+    protocol_version = 'HTTP/1.1'
+    latency = 0.0
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        time.sleep(self.latency)
+        body = json.dumps({
+            'id': 'stub', 'object': 'chat.completion', 'created': 0, 'model': request['model'],
+            'choices': [{'index': 0, 'finish_reason': 'stop', 'message': {'role': 'assistant', 'content': STUB_COMPLETION}}],
+            'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0},
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+def start_stub_llm(latency=0.0):
+    """Serve the stub Groq API on a free local port; returns the server."""
+    handler = type('Handler', (StubLLMHandler,), {'latency': latency})
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+class StubRenderer:
+    """Returns one blank PNG for every chart so report timings exclude rasterization."""
+
+    name = 'stub'
+    _png = None
+
+    def render(self, fig, chart_name):
+        if StubRenderer._png is None:
+            from PIL import Image
+            buffer = io.BytesIO()
+            Image.new('RGB', (800, 400), 'white').save(buffer, format='PNG')
+            StubRenderer._png = buffer.getvalue()
+        return StubRenderer._png
+
+    def close(self):
+        """Nothing to release."""
+
+class RssSampler:
+    """Tracks the peak resident set size of this process while a stage runs.
+
+    Samples /proc/self/statm from a background thread; where that file does
+    not exist the process-wide ru_maxrss is reported instead.
+    """
+
+    def __init__(self):
+        self.page_size = os.sysconf('SC_PAGE_SIZE')
+        self.available = os.path.exists('/proc/self/statm')
+        self.peak = 0
+        self._running = False
+        self._thread = None
+
+    def _rss(self):
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * self.page_size
+
+    def _sample(self):
+        while self._running:
+            self.peak = max(self.peak, self._rss())
+            time.sleep(RSS_SAMPLE_SECONDS)
+
+    def __enter__(self):
+        if self.available:
+            self.peak = self._rss()
+            self._running = True
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self.available:
+            self._running = False
+            self._thread.join()
+            self.peak = max(self.peak, self._rss())
+        else:
+            # ru_maxrss is in kilobytes on Linux and bytes on macOS
+            scale = 1 if sys.platform == 'darwin' else 1024
+            self.peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+def stage_functions():
+    """Return {stage: fn(state)}; each stage reads what earlier stages stored in `state`."""
+    from utils.aggregation import build_cube
+    from utils.chart_rendering import RENDERERS
+    from utils.data_processing import FilterIndex, filter_data, load_data, preprocess_data
+    from utils.nlp_analysis import extract_themes, get_actionable_insights, search_feedback
+    from utils.report_generation import generate_pdf_report
+    from utils.retrieval import RetrievalIndex
+    from utils.search import SearchIndex
+    from utils.term_frequencies import TermFrequencies
+    from utils.topic_model import ThemeDiscovery
+    from utils.visualization import (create_donut_chart, create_line_chart, create_bar_chart, create_histogram,
+                                     create_scatter_plot, create_sunburst_chart, create_wordcloud)
+    RENDERERS[StubRenderer.name] = StubRenderer
+
+    def filter_stage(state):
+        df = state['df']
+        start, end = df['day'].min(), df['day'].max()
+        date_range = ((start + (end - start) / 4).date(), (end - (end - start) / 4).date())
+        state['filtered'] = filter_data(df, date_range, ['Positive', 'Negative'], ['Service', 'Delivery', 'General'],
+                                        index=state['filter_index'])
+
+    def insights_stage(state):
+        state['insights'] = get_actionable_insights(state['df'], 'benchmark-key')
+        if 'Unable to generate insights' in state['insights']:
+            raise RuntimeError("Insights failed against the stub LLM server")
+
+    def charts_stage(state):
+        cube = state['cube']
+        state['charts'] = [create_donut_chart(cube), create_line_chart(cube), create_bar_chart(cube),
+                           create_histogram(cube), create_scatter_plot(cube), create_sunburst_chart(cube)]
+
+    def wordcloud_stage(state):
+        terms = state['term_frequencies']
+        state['wordclouds'] = create_wordcloud(state['df'], frequencies=(terms.frequencies('Positive'),
+                                                                         terms.frequencies('Negative')))
+
+    def report_stage(state):
+        df = state['df']
+        state['report'] = generate_pdf_report(df, *state['charts'], *state['wordclouds'], extract_themes(df),
+                                              state['insights'], renderer_name=StubRenderer.name,
+                                              render_executor='thread',
+                                              discovered_themes=state['topic_model'].themes())
+
+    return {
+        'load': lambda state: state.update(raw=load_data(state['csv_path'])),
+        'preprocess': lambda state: state.update(df=preprocess_data(state.pop('raw'))),
+        'filter_index': lambda state: state.update(filter_index=FilterIndex(state['df'])),
+        'filter': filter_stage,
+        'cube': lambda state: state.update(cube=build_cube(state['df'])),
+        'charts': charts_stage,
+        'term_frequencies': lambda state: state.update(term_frequencies=TermFrequencies.build(state['df'])),
+        'wordcloud': wordcloud_stage,
+        'search_index': lambda state: state.update(search_index=SearchIndex.build(state['df']['feedback'])),
+        'search': lambda state: search_feedback(state['df'], 'delivery OR "great service" refund*',
+                                                index=state['search_index']),
+        'retrieval_index': lambda state: RetrievalIndex.build(state['df']['feedback']),
+        'topic_model': lambda state: state.update(topic_model=ThemeDiscovery.build(state['df']['feedback'])),
+        'insights': insights_stage,
+        'report': report_stage,
+    }
+
+def warm_imports():
+    """Import the lazily loaded dependencies up front; bench_imports covers their import time."""
+    import groq, httpx, PIL.Image, reportlab.platypus, sklearn.decomposition, sklearn.feature_extraction.text, wordcloud  # noqa: F401
+
+def run_worker(csv_path, rows, stages):
+    """Run the stages in this process and print one JSON result per stage."""
+    functions = stage_functions()
+    warm_imports()
+    state = {'csv_path': csv_path}
+    results = []
+    for stage in STAGES:
+        if stage not in stages:
+            continue
+        with RssSampler() as rss:
+            start = time.perf_counter()
+            functions[stage](state)
+            seconds = time.perf_counter() - start
+        results.append({'rows': rows, 'stage': stage, 'seconds': seconds,
+                        'rows_per_second': rows / seconds if seconds else None,
+                        'peak_rss_mb': rss.peak / 1e6})
+    print(json.dumps(results))
+
+def missing_dependencies(stages):
+    """Stages that need an earlier stage which was not selected."""
+    needs = {'preprocess': 'load', 'filter_index': 'preprocess', 'filter': 'filter_index', 'cube': 'preprocess',
+             'charts': 'cube', 'term_frequencies': 'preprocess', 'wordcloud': 'term_frequencies',
+             'search_index': 'preprocess', 'search': 'search_index', 'retrieval_index': 'preprocess',
+             'topic_model': 'preprocess', 'insights': 'preprocess', 'report': ('charts', 'wordcloud', 'insights', 'topic_model')}
+    missing = []
+    for stage in stages:
+        required = needs.get(stage, ())
+        for dependency in (required,) if isinstance(required, str) else required:
+            if dependency not in stages:
+                missing.append(f"{stage} needs {dependency}")
+    return missing
+
+def run_size(rows, stages, options, repeat, llm_url, work_dir):
+    """Generate the input for `rows`, run it `repeat` times in fresh interpreters and keep the best of each stage."""
+    csv_path = os.path.join(work_dir, f"feedback_{rows}.csv")
+    write_csv(generate_feedback(rows, **options), csv_path)
+    env = {**os.environ, 'GROQ_BASE_URL': llm_url, 'LLM_CACHE_TTL': '0', 'TRACE_EXPORT': '', 'TRACE_PROFILE': ''}
+    best = {}
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-m', 'benchmarks.bench_pipeline', '--worker', csv_path,
+                                 '--rows', str(rows), '--stages', *stages],
+                                capture_output=True, text=True, env=env)
+        if output.returncode != 0:
+            raise RuntimeError(f"Benchmark at {rows:,} rows failed:\n{output.stderr[-2000:]}")
+        for result in json.loads(output.stdout.strip().splitlines()[-1]):
+            previous = best.get(result['stage'])
+            if previous is None or result['seconds'] < previous['seconds']:
+                best[result['stage']] = result
+    os.remove(csv_path)
+    return [best[stage] for stage in STAGES if stage in best]
+
+def git_commit():
+    """Current commit hash, or None outside a git checkout."""
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results, baseline_path, threshold):
+    """Print per-stage ratios against a previous results file; return the regressions."""
+    with open(baseline_path) as f:
+        baseline = {(r['rows'], r['stage']): r for r in json.load(f)['results']}
+    regressions = []
+    print(f"\nCompared with {baseline_path}:")
+    for result in results:
+        previous = baseline.get((result['rows'], result['stage']))
+        if previous is None:
+            continue
+        ratio = result['seconds'] / previous['seconds'] if previous['seconds'] else float('inf')
+        slower = ratio > threshold and result['seconds'] - previous['seconds'] > NOISE_FLOOR_SECONDS
+        flag = '  REGRESSION' if slower else ''
+        print(f"{result['rows']:>12,} {result['stage']:<18} {previous['seconds']:9.3f}s -> {result['seconds']:9.3f}s"
+              f"  x{ratio:5.2f}{flag}")
+        if flag:
+            regressions.append(f"{result['stage']} at {result['rows']:,} rows is x{ratio:.2f} slower")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=DEFAULT_ROWS)
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES)
+    parser.add_argument('--repeat', type=int, default=1, help="runs per size; the fastest time of each stage is kept")
+    parser.add_argument('--llm-latency', type=float, default=0.0, help="seconds the stub LLM server waits per request")
+    parser.add_argument('-o', '--output', default=None, help="write results as JSON to this file")
+    parser.add_argument('--compare', default=None, help="previous results file to compare against")
+    parser.add_argument('--threshold', type=float, default=1.2, help="slowdown ratio reported as a regression (default 1.2)")
+    parser.add_argument('--worker', default=None, help=argparse.SUPPRESS)
+    add_generator_arguments(parser)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.rows[0], args.stages)
+        return
+    missing = missing_dependencies(args.stages)
+    if missing:
+        parser.error('; '.join(missing))
+
+    options = generator_options(args)
+    server = start_stub_llm(args.llm_latency)
+    llm_url = f"http://127.0.0.1:{server.server_address[1]}"
+    results = []
+    try:
+        with tempfile.TemporaryDirectory() as work_dir:
+            for rows in args.rows:
+                for result in run_size(rows, args.stages, options, args.repeat, llm_url, work_dir):
+                    results.append(result)
+                    print(f"{rows:>12,} {result['stage']:<18} {result['seconds']:9.3f}s "
+                          f"{result['rows_per_second'] or 0:>14,.0f} rows/s {result['peak_rss_mb']:9.1f} MB peak RSS",
+                          flush=True)
+    finally:
+        server.shutdown()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'commit': git_commit(),
+                'created': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'cpu_count': os.cpu_count(),
+                'generator': options,
+                'repeat': args.repeat,
+                'results': results,
+            }, f, indent=2)
+    regressions = compare(results, args.compare, args.threshold) if args.compare else []
+    for regression in regressions:
+        print(f"FAIL: {regression}")
+    sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Benchmark batch vs per-row sentiment classification.
+
+Run from the repository root:
+    python -m benchmarks.bench_sentiment --rows 1000000
+
+With --workers above 1 it also checks that sharded classification matches the
+serial path on feedback that mixes text, numbers and missing cells.
+"""
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from utils.data_processing import classify_feedback, MIN_SHARD_ROWS
+from utils.nlp_analysis import (analyze_sentiment, analyze_sentiment_batch,
+                                POSITIVE_KEYWORDS, NEGATIVE_KEYWORDS,
+                                THEME_KEYWORDS, ThemeMatcher)
+
+SAMPLE_FEEDBACK = [
+    "Great service and friendly staff!",
+    "The product arrived defective and support was unresponsive.",
+    "Store was messy and the checkout wait was long.",
+    "Delivery was on time.",
+    "Love the new collection, amazing quality.",
+    "Poor packaging, item damaged.",
+    "Average experience, nothing special.",
+]
+
+def analyze_sentiment_legacy(text):
+    """Original per-row classifier, kept as the baseline."""
+    text = text.lower()
+    if any(word in text for word in POSITIVE_KEYWORDS):
+        return 'Positive'
+    elif any(word in text for word in NEGATIVE_KEYWORDS):
+        return 'Negative'
+    return 'Neutral'
+
+def make_feedback(rows, seed=0):
+    """Build a synthetic feedback Series of the given length."""
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, len(SAMPLE_FEEDBACK), size=rows)
+    return pd.Series(np.array(SAMPLE_FEEDBACK, dtype=object)[picks], name='feedback')
+
+def check_parallel_parity(rows, workers):
+    """Assert sharded and serial classification agree on mixed-type feedback."""
+    rows = max(rows, 2 * MIN_SHARD_ROWS)
+    feedback = make_feedback(rows)
+    feedback.iloc[::7] = 42
+    feedback.iloc[3::11] = 3.5
+    feedback.iloc[5::13] = None
+    matcher = ThemeMatcher(THEME_KEYWORDS)
+    columns = ['sentiment', 'theme']
+    for sample in (feedback, pd.Series(np.arange(rows), name='feedback')):
+        df = pd.DataFrame({'date': pd.Timestamp('2024-01-01'), 'feedback': sample})
+        serial = classify_feedback(df.copy(), matcher, workers=1)[columns]
+        start = time.perf_counter()
+        sharded = classify_feedback(df.copy(), matcher, workers=workers)[columns]
+        seconds = time.perf_counter() - start
+        assert sharded.equals(serial), "Sharded classification disagrees with the serial path"
+    print(f"sharded: {seconds:.3f}s on {workers} workers, matches serial on mixed-type input")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--workers', type=int, default=1)
+    args = parser.parse_args()
+
+    feedback = make_feedback(args.rows)
+
+    start = time.perf_counter()
+    expected = feedback.apply(analyze_sentiment_legacy)
+    legacy_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    scalar = feedback.apply(analyze_sentiment)
+    scalar_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = analyze_sentiment_batch(feedback)
+    batch_seconds = time.perf_counter() - start
+
+    assert scalar.equals(expected), "analyze_sentiment disagrees with the legacy classifier"
+    assert (result.to_numpy() == expected.to_numpy()).all(), "Batch classifier disagrees with the legacy classifier"
+    print(f"rows:   {args.rows:,}")
+    print(f"legacy: {legacy_seconds:.3f}s ({args.rows / legacy_seconds:,.0f} rows/s)")
+    print(f"scalar: {scalar_seconds:.3f}s ({args.rows / scalar_seconds:,.0f} rows/s)")
+    print(f"batch:  {batch_seconds:.3f}s ({args.rows / batch_seconds:,.0f} rows/s)")
+    if args.workers > 1:
+        check_parallel_parity(args.rows, args.workers)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Generate deterministic synthetic retail feedback.
+
+Run from the repository root:
+    python -m benchmarks.synthetic --rows 1000000 -o feedback.csv
+
+The same arguments always produce the same file, so benchmark runs on
+different commits see identical input.
+"""
+import argparse
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+from utils.nlp_analysis import POSITIVE_KEYWORDS, NEGATIVE_KEYWORDS, THEME_KEYWORDS
+
+FILLER_WORDS = [
+    'the', 'my', 'order', 'was', 'and', 'it', 'very', 'really', 'again', 'visit', 'price', 'online', 'app',
+    'experience', 'today', 'week', 'return', 'refund', 'size', 'color', 'box', 'aisle', 'cashier', 'parking',
+    'bag', 'receipt', 'sale', 'member', 'card', 'shelf', 'stock', 'brand', 'time', 'team', 'manager', 'call',
+]
+
+def make_comments(count, words=12, keyword_mix=(0.35, 0.25), theme_share=0.8, seed=0):
+    """Return `count` comments of about `words` words.
+
+    `keyword_mix` is the share of comments containing a positive and a negative
+    sentiment keyword (the rest are neutral); `theme_share` is the share that
+    mention a theme keyword.
+    """
+    rng = np.random.default_rng(seed)
+    positive, negative = keyword_mix
+    theme_words = [word for keywords in THEME_KEYWORDS.values() for word in keywords]
+    lengths = np.maximum(3, rng.poisson(words, size=count))
+    kinds = rng.choice(3, size=count, p=[positive, negative, 1 - positive - negative])
+    has_theme = rng.random(count) < theme_share
+    comments = []
+    for length, kind, themed in zip(lengths, kinds, has_theme):
+        tokens = list(rng.choice(FILLER_WORDS, size=length))
+        if kind < 2:
+            keywords = POSITIVE_KEYWORDS if kind == 0 else NEGATIVE_KEYWORDS
+            tokens[rng.integers(length)] = keywords[rng.integers(len(keywords))]
+        if themed:
+            tokens.insert(rng.integers(length + 1), theme_words[rng.integers(len(theme_words))])
+        comments.append(' '.join(tokens).capitalize() + '.')
+    return comments
+
+def generate_feedback(rows, start='2023-01-01', days=730, words=12, keyword_mix=(0.35, 0.25), theme_share=0.8,
+                      distinct=100_000, seed=0):
+    """Return a DataFrame with feedback and date columns, like an uploaded CSV.
+
+    Comments are drawn from a pool of `distinct` generated comments, so large
+    row counts cost little more to generate than the pool itself. Dates are
+    spread uniformly over `days` days from `start`.
+    """
+    rng = np.random.default_rng(seed)
+    pool = np.array(make_comments(min(rows, distinct), words, keyword_mix, theme_share, seed), dtype=object)
+    seconds = rng.integers(0, days * 86_400, size=rows)
+    return pd.DataFrame({
+        'feedback': pool[rng.integers(0, len(pool), size=rows)],
+        'date': pd.Timestamp(start) + pd.to_timedelta(seconds, unit='s'),
+    })
+
+def write_csv(df, path):
+    """Write a generated frame as CSV quickly enough for tens of millions of rows."""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.set_column(1, 'date', table['date'].cast(pa.timestamp('s')))
+    pacsv.write_csv(table, path)
+
+def add_generator_arguments(parser):
+    """Register the generator options on an argparse parser."""
+    parser.add_argument('--days', type=int, default=730, help="date span in days (default 730)")
+    parser.add_argument('--words', type=int, default=12, help="mean comment length in words (default 12)")
+    parser.add_argument('--positive', type=float, default=0.35, help="share of comments with a positive keyword")
+    parser.add_argument('--negative', type=float, default=0.25, help="share of comments with a negative keyword")
+    parser.add_argument('--theme-share', type=float, default=0.8, help="share of comments mentioning a theme keyword")
+    parser.add_argument('--distinct', type=int, default=100_000, help="number of distinct comments (default 100000)")
+    parser.add_argument('--seed', type=int, default=0)
+
+def generator_options(args):
+    """Map parsed arguments to generate_feedback() keyword arguments."""
+    return {'days': args.days, 'words': args.words, 'keyword_mix': (args.positive, args.negative),
+            'theme_share': args.theme_share, 'distinct': args.distinct, 'seed': args.seed}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('-o', '--output', default='feedback.csv')
+    add_generator_arguments(parser)
+    args = parser.parse_args()
+    write_csv(generate_feedback(args.rows, **generator_options(args)), args.output)
+    print(f"Wrote {args.rows:,} rows to {args.output}")
+
+if __name__ == "__main__":
+    main()
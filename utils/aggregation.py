@@ -0,0 +1,127 @@
+import logging
+import os
+import numpy as np
+import pandas as pd
+from utils.persisted_index import PersistedIndex
+from utils.tracing import traced
+
+logger = logging.getLogger(__name__)
+
+CUBE_DIMENSIONS = ['day', 'theme', 'sentiment']
+# Trend charts show at most about this many points; longer date ranges switch to weeks, then months
+MAX_TREND_POINTS = int(os.getenv("TREND_MAX_POINTS", 180))
+# Period starts: weeks begin on Monday, months on the 1st
+TREND_RESOLUTIONS = {'day': 'D', 'week': 'W-MON', 'month': 'MS'}
+
+@traced()
+def build_cube(df):
+    """Count feedback per (day, theme, sentiment) for the current filter state.
+
+    Every dashboard chart renders from this cube, so its size depends on the
+    number of days and labels rather than on the number of rows.
+    """
+    cube = df.groupby(CUBE_DIMENSIONS, observed=True).size().reset_index(name='count')
+    logger.debug(f"Built aggregation cube with {len(cube)} cells from {len(df)} rows")
+    return cube
+
+class DailyRollup(PersistedIndex):
+    """The (day, theme, sentiment) cube of a whole dataset, stored next to it at ingestion.
+
+    Views filtered only by date, sentiment and theme are slices of this table,
+    so they cost thousands of aggregate rows instead of millions of raw ones.
+    """
+
+    suffix = '.rollup.joblib'
+
+    def __init__(self, cube, rows):
+        self.cube = cube
+        self.rows = rows
+
+    @classmethod
+    @traced()
+    def build(cls, df):
+        """Aggregate a preprocessed frame."""
+        return cls(build_cube(df), len(df))
+
+    def __len__(self):
+        return self.rows
+
+    def extend(self, df):
+        """Add the counts of the rows after len(self)."""
+        cube = pd.concat([self.cube, build_cube(df.iloc[self.rows:])], ignore_index=True)
+        cube = cube.groupby(CUBE_DIMENSIONS, observed=True)['count'].sum().reset_index()
+        return type(self)(cube, len(df))
+
+@traced()
+def rollup(cube, by):
+    """Sum cube counts over the given dimensions, dropping empty groups."""
+    totals = cube.groupby(by, observed=True)['count'].sum()
+    return totals[totals > 0]
+
+def trend_resolution(start, end, max_points=MAX_TREND_POINTS):
+    """Finest of day, week and month that keeps a trend from `start` to `end` within `max_points`."""
+    days = (end - start).days + 1
+    if days <= max_points:
+        return 'day'
+    if days / 7 <= max_points:
+        return 'week'
+    return 'month'
+
+@traced()
+def sentiment_trend(cube, resolution='auto', rolling=None):
+    """Counts per period and sentiment, resampled from the daily cube.
+
+    `resolution` is 'day', 'week', 'month' or 'auto' (picked from the date
+    span by trend_resolution). Periods without feedback count as zero, and
+    `rolling` averages each sentiment over that many periods. Returns the
+    frame indexed by period start and the resolution used.
+    """
+    daily = rollup(cube, ['day', 'sentiment']).unstack(fill_value=0)
+    if resolution == 'auto':
+        resolution = trend_resolution(daily.index.min(), daily.index.max()) if len(daily) else 'day'
+    if not len(daily):
+        return daily, resolution
+    trend = daily.resample(TREND_RESOLUTIONS[resolution], label='left', closed='left').sum()
+    if rolling and rolling > 1:
+        trend = trend.rolling(rolling, min_periods=1).mean()
+    return trend, resolution
+
+SENTIMENT_SCORES = {'Positive': 1, 'Neutral': 0, 'Negative': -1}
+
+@traced()
+def priority_matrix(cube, recency_half_life_days=None, confidence_z=1.96):
+    """Per-theme frequency, impact and confidence interval computed in one grouped pass.
+
+    Impact is the mean sentiment score (Positive=1, Neutral=0, Negative=-1).
+    With `recency_half_life_days` each day's feedback is weighted by
+    0.5 ** (age / half_life) relative to the latest day, and the confidence
+    interval uses the weighted variance over the effective sample size.
+    """
+    cells = cube[cube['count'] > 0]
+    score = cells['sentiment'].astype(str).map(SENTIMENT_SCORES).to_numpy(dtype=float)
+    count = cells['count'].to_numpy(dtype=float)
+    if recency_half_life_days:
+        age_days = (cells['day'].max() - cells['day']).dt.days.to_numpy(dtype=float)
+        weight = 0.5 ** (age_days / recency_half_life_days)
+    else:
+        weight = np.ones(len(cells))
+    sums = pd.DataFrame({
+        'theme': cells['theme'].astype(str).to_numpy(),
+        'frequency': count,
+        'weight': count * weight,
+        'weighted_score': count * weight * score,
+        'weighted_square': count * weight * score ** 2,
+        'weight_square': count * weight ** 2,
+    }).groupby('theme', sort=False).sum()
+    impact = sums['weighted_score'] / sums['weight']
+    variance = (sums['weighted_square'] / sums['weight'] - impact ** 2).clip(lower=0)
+    effective_n = sums['weight'] ** 2 / sums['weight_square']
+    margin = confidence_z * np.sqrt(variance / effective_n)
+    matrix = pd.DataFrame({
+        'frequency': sums['frequency'].astype(int),
+        'impact': impact,
+        'ci_low': impact - margin,
+        'ci_high': impact + margin,
+        'margin': margin,
+    })
+    return matrix.sort_values('frequency', ascending=False, kind='stable').reset_index()
@@ -0,0 +1,123 @@
+import hashlib
+import json
+import logging
+import os
+import pyarrow as pa
+from utils.nlp_analysis import POSITIVE_KEYWORDS, NEGATIVE_KEYWORDS, THEME_KEYWORDS
+from utils.tracing import traced
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever preprocessing changes in a way the keyword lists don't capture
+PIPELINE_VERSION = 2
+
+CACHED_COLUMNS = ['date', 'day', 'feedback', 'sentiment', 'theme']
+DEFAULT_CACHE_DIR = os.getenv("ANALYSIS_CACHE_DIR", os.path.join(".cache", "analysis"))
+DEFAULT_MAX_BYTES = int(os.getenv("ANALYSIS_CACHE_MAX_BYTES", 2 * 1024 ** 3))
+HASH_BLOCK_SIZE = 1024 * 1024
+
+def pipeline_fingerprint():
+    """Return a digest of everything that determines preprocessing output."""
+    spec = {
+        'version': PIPELINE_VERSION,
+        'positive': POSITIVE_KEYWORDS,
+        'negative': NEGATIVE_KEYWORDS,
+        'themes': THEME_KEYWORDS,
+        'columns': CACHED_COLUMNS,
+    }
+    return hashlib.sha256(json.dumps(spec, sort_keys=True).encode()).hexdigest()
+
+@traced()
+def hash_upload(uploaded_file):
+    """Hash the bytes of an uploaded file (or path) together with the pipeline fingerprint."""
+    digest = hashlib.sha256(pipeline_fingerprint().encode())
+    if isinstance(uploaded_file, (str, os.PathLike)):
+        with open(uploaded_file, 'rb') as f:
+            for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+                digest.update(block)
+        return digest.hexdigest()
+    position = uploaded_file.tell()
+    uploaded_file.seek(0)
+    for block in iter(lambda: uploaded_file.read(HASH_BLOCK_SIZE), b''):
+        digest.update(block)
+    uploaded_file.seek(position)
+    return digest.hexdigest()
+
+class AnalysisCache:
+    """Persistent cache of preprocessed frames stored as Arrow IPC files.
+
+    Entries are keyed by hash_upload, memory-mapped on reload and evicted
+    least-recently-used first once the directory exceeds max_bytes.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def path_for(self, key, suffix='.arrow'):
+        """Return the file path for a cache key."""
+        return os.path.join(self.cache_dir, f"{key}{suffix}")
+
+    @traced()
+    def get(self, key):
+        """Return the cached frame for `key`, or None on a miss."""
+        path = self.path_for(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with pa.memory_map(path, 'r') as source:
+                table = pa.ipc.open_file(source).read_all()
+            df = table.to_pandas()
+            # Refresh the modification time so eviction treats this entry as recently used
+            os.utime(path)
+            logger.info(f"Analysis cache hit for {key[:12]}")
+            return df
+        except Exception as e:
+            logger.error(f"Error reading analysis cache entry {key[:12]}: {str(e)}")
+            self._remove(path)
+            return None
+
+    @traced()
+    def put(self, key, df):
+        """Store `df` under `key` and evict old entries if over budget."""
+        path = self.path_for(key)
+        tmp_path = self.path_for(key, '.arrow.tmp')
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            table = pa.Table.from_pandas(df[CACHED_COLUMNS], preserve_index=False)
+            with pa.OSFile(tmp_path, 'wb') as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+            os.replace(tmp_path, path)
+            logger.info(f"Stored analysis cache entry {key[:12]} ({os.path.getsize(path)} bytes)")
+            self.evict(keep=path)
+        except Exception as e:
+            logger.error(f"Error writing analysis cache entry {key[:12]}: {str(e)}")
+            self._remove(tmp_path)
+
+    @traced()
+    def evict(self, keep=None):
+        """Delete least-recently-used entries until the cache fits in max_bytes."""
+        if not os.path.isdir(self.cache_dir):
+            return
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if os.path.isfile(path):
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            self._remove(path)
+            total -= size
+
+    def _remove(self, path):
+        """Remove a cache file, ignoring files that are already gone."""
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
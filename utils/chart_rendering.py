@@ -0,0 +1,525 @@
+import atexit
+import io
+import logging
+import multiprocessing
+import os
+import re
+import signal
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from multiprocessing.util import Finalize
+import numpy as np
+import pandas as pd
+from utils.tracing import in_context, traced
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RENDERER = os.getenv("CHART_RENDERER", "matplotlib")
+FALLBACK_RENDERER = os.getenv("CHART_RENDERER_FALLBACK", "")
+RENDER_WORKERS = int(os.getenv("CHART_RENDER_WORKERS", 4))
+# Matplotlib rendering holds the GIL, so processes are the default; browser backends can use threads
+RENDER_EXECUTOR = os.getenv("CHART_RENDER_EXECUTOR", "process")
+RENDER_TIMEOUT_SECONDS = float(os.getenv("CHART_RENDER_TIMEOUT", 60))
+CHART_WIDTH_PX = 800
+CHART_HEIGHT_PX = 400
+# Charts use white text on a transparent background; draw them on the dashboard colour
+DEFAULT_BACKGROUND = '#1e293b'
+DEFAULT_COLORWAY = ['#636efa', '#EF553B', '#00cc96', '#ab63fa', '#FFA15A', '#19d3f3', '#FF6692', '#B6E880']
+
+def to_mpl_color(color, default=None):
+    """Convert a Plotly colour string (hex, named, rgb() or rgba()) to a matplotlib colour."""
+    if color is None:
+        return default
+    match = re.match(r'rgba?\(([^)]*)\)', str(color).replace(' ', ''))
+    if match:
+        parts = [float(p) for p in match.group(1).split(',')]
+        rgb = tuple(p / 255 for p in parts[:3])
+        return rgb + (parts[3],) if len(parts) == 4 else rgb
+    return color
+
+def is_transparent(color):
+    """True when a colour is unset or fully transparent."""
+    converted = to_mpl_color(color)
+    return converted is None or (isinstance(converted, tuple) and len(converted) == 4 and converted[3] == 0)
+
+def as_plot_values(values):
+    """Return trace coordinates as an array matplotlib can plot, parsing dates when needed."""
+    values = np.asarray(values if values is not None else [])
+    if values.dtype.kind == 'O' and len(values) and not isinstance(values[0], str):
+        try:
+            return pd.to_datetime(values).to_numpy()
+        except (TypeError, ValueError):
+            pass
+    return values
+
+class MatplotlibRenderer:
+    """Offline renderer that redraws Plotly figures with matplotlib's Agg backend.
+
+    Supports the trace types the dashboard produces (pie, scatter, bar,
+    pre-aggregated histogram and sunburst); needs no browser or network.
+    """
+
+    name = 'matplotlib'
+
+    def __init__(self, width=CHART_WIDTH_PX, height=CHART_HEIGHT_PX, dpi=150):
+        self.width = width
+        self.height = height
+        self.dpi = dpi
+
+    def render(self, fig, chart_name):
+        """Render `fig` to PNG bytes."""
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        layout = fig.layout
+        background = DEFAULT_BACKGROUND if is_transparent(layout.paper_bgcolor) else to_mpl_color(layout.paper_bgcolor)
+        text_color = to_mpl_color(layout.font.color, '#444444')
+        figure = Figure(figsize=(self.width / 100, self.height / 100), dpi=self.dpi, facecolor=background)
+        FigureCanvasAgg(figure)
+        ax = figure.add_subplot(1, 1, 1, facecolor=background)
+        trace_types = {trace.type for trace in fig.data}
+        if trace_types & {'pie', 'sunburst'}:
+            ax.set_aspect('equal')
+            ax.axis('off')
+        else:
+            self._style_axes(ax, layout, text_color)
+        bar_traces = [trace for trace in fig.data if trace.type in ('bar', 'histogram')]
+        if bar_traces:
+            self._draw_bars(ax, bar_traces, layout)
+        for trace in fig.data:
+            if trace.type == 'pie':
+                self._draw_pie(ax, trace, layout, text_color)
+            elif trace.type == 'scatter':
+                self._draw_scatter(figure, ax, trace, layout, text_color)
+            elif trace.type == 'sunburst':
+                self._draw_sunburst(ax, trace, layout, text_color)
+            elif trace.type not in ('bar', 'histogram'):
+                raise ValueError(f"Unsupported trace type '{trace.type}' in chart {chart_name}")
+        if layout.showlegend is not False and any(trace.name for trace in fig.data if trace.type in ('scatter', 'histogram')):
+            legend = ax.legend(frameon=False, fontsize=8)
+            for text in legend.get_texts():
+                text.set_color(text_color)
+        figure.tight_layout()
+        buffer = io.BytesIO()
+        figure.savefig(buffer, format='png', facecolor=background)
+        return buffer.getvalue()
+
+    def close(self):
+        """Nothing to release; present for interface parity."""
+
+    def _style_axes(self, ax, layout, text_color):
+        """Apply axis titles, tick angles and grid colours from the Plotly layout."""
+        ax.set_xlabel(layout.xaxis.title.text or '', color=text_color)
+        ax.set_ylabel(layout.yaxis.title.text or '', color=text_color)
+        ax.tick_params(colors=text_color, labelsize=8)
+        if layout.xaxis.tickangle:
+            for label in ax.get_xticklabels():
+                label.set_rotation(layout.xaxis.tickangle)
+        for spine in ax.spines.values():
+            spine.set_color(text_color)
+            spine.set_alpha(0.3)
+        grid_color = to_mpl_color(layout.yaxis.gridcolor)
+        if grid_color is not None:
+            # rcParams grid.alpha would override the alpha channel of the colour
+            alpha = grid_color[3] if isinstance(grid_color, tuple) and len(grid_color) == 4 else None
+            ax.grid(True, color=grid_color[:3] if alpha is not None else grid_color, alpha=alpha)
+            ax.set_axisbelow(True)
+
+    def _draw_pie(self, ax, trace, layout, text_color):
+        colors = trace.marker.colors or layout.piecolorway or DEFAULT_COLORWAY
+        hole = trace.hole or 0
+        labels = list(trace.labels) if 'label' in (trace.textinfo or '') else None
+        ax.pie(
+            trace.values,
+            labels=labels,
+            colors=[to_mpl_color(c) for c in colors][:len(trace.values)] if len(colors) >= len(trace.values) else None,
+            autopct='%1.1f%%' if 'percent' in (trace.textinfo or 'percent') else None,
+            pctdistance=1 - (1 - hole) / 2,
+            wedgeprops=dict(width=1 - hole),
+            textprops=dict(color=text_color, fontsize=8),
+            startangle=90,
+            counterclock=False,
+        )
+
+    def _draw_scatter(self, figure, ax, trace, layout, text_color):
+        x = as_plot_values(trace.x)
+        y = as_plot_values(trace.y)
+        mode = trace.mode or 'lines'
+        if 'lines' in mode:
+            color = to_mpl_color(trace.line.color)
+            ax.plot(x, y, color=color, linewidth=(trace.line.width or 2) / 1.5,
+                    marker='o' if 'markers' in mode else None, markersize=4, label=trace.name)
+            return
+        sizes = np.asarray(trace.marker.size if trace.marker.size is not None else 8, dtype=float)
+        if trace.marker.sizeref:
+            # Plotly area sizing: diameter in px = sqrt(size / sizeref)
+            sizes = np.sqrt(sizes / trace.marker.sizeref)
+        marker_sizes = (sizes * 0.75) ** 2
+        colors = trace.marker.color
+        if trace.error_y.array is not None:
+            ax.errorbar(x, y, yerr=np.asarray(trace.error_y.array, dtype=float), fmt='none',
+                        ecolor=text_color, alpha=0.6, capsize=3, zorder=1)
+        if colors is not None and np.asarray(colors).dtype.kind in 'fiu':
+            from matplotlib.colors import LinearSegmentedColormap, Normalize
+            colorscale = layout.coloraxis.colorscale or [[0, '#0d0887'], [1, '#f0f921']]
+            cmap = LinearSegmentedColormap.from_list('plotly', [(stop, to_mpl_color(c)) for stop, c in colorscale])
+            values = np.asarray(colors, dtype=float)
+            norm = Normalize(vmin=np.nanmin(values), vmax=np.nanmax(values)) if len(values) else None
+            points = ax.scatter(x, y, s=marker_sizes, c=values, cmap=cmap, norm=norm, zorder=2)
+            colorbar = figure.colorbar(points, ax=ax)
+            colorbar.ax.tick_params(colors=text_color, labelsize=7)
+            title = layout.coloraxis.colorbar.title.text
+            if title:
+                colorbar.set_label(title, color=text_color)
+        else:
+            ax.scatter(x, y, s=marker_sizes, color=to_mpl_color(colors), label=trace.name, zorder=2)
+        if trace.text is not None and 'text' in mode:
+            for xi, yi, label in zip(x, y, trace.text):
+                ax.annotate(str(label), (xi, yi), textcoords='offset points', xytext=(0, 8),
+                            ha='center', color=text_color, fontsize=8)
+        ax.margins(0.15)
+
+    def _draw_bars(self, ax, traces, layout):
+        categories = []
+        series = []
+        for trace in traces:
+            x = [str(v) for v in (trace.x if trace.x is not None else [])]
+            if trace.type == 'histogram' and trace.y is None:
+                totals = pd.Series(1, index=x).groupby(level=0, sort=False).sum()
+            else:
+                totals = pd.Series(np.asarray(trace.y, dtype=float), index=x).groupby(level=0, sort=False).sum()
+            for category in totals.index:
+                if category not in categories:
+                    categories.append(category)
+            series.append((trace, totals))
+        positions = np.arange(len(categories))
+        grouped = layout.barmode == 'group' and len(series) > 1
+        width = 0.8 / len(series) if grouped else 0.8
+        bottoms = np.zeros(len(categories))
+        for i, (trace, totals) in enumerate(series):
+            heights = totals.reindex(categories, fill_value=0).to_numpy(dtype=float)
+            offset = (i - (len(series) - 1) / 2) * width if grouped else 0
+            edge = trace.marker.line.color if trace.marker.line is not None else None
+            ax.bar(positions + offset, heights, width=width, bottom=None if grouped else bottoms,
+                   color=to_mpl_color(trace.marker.color), edgecolor=to_mpl_color(edge),
+                   linewidth=(trace.marker.line.width or 0) / 2 if edge else 0, label=trace.name if grouped else None)
+            if not grouped:
+                bottoms += heights
+        ax.set_xticks(positions, categories)
+        if layout.xaxis.tickangle:
+            for label in ax.get_xticklabels():
+                label.set_rotation(layout.xaxis.tickangle)
+                label.set_horizontalalignment('right')
+
+    def _draw_sunburst(self, ax, trace, layout, text_color):
+        from matplotlib.patches import Wedge
+        ids = list(trace.ids if trace.ids is not None else trace.labels)
+        parents = list(trace.parents)
+        values = dict(zip(ids, np.asarray(trace.values, dtype=float)))
+        labels = dict(zip(ids, trace.labels))
+        colorway = layout.sunburstcolorway or DEFAULT_COLORWAY
+        colors = dict(zip(ids, trace.marker.colors)) if trace.marker.colors is not None else {}
+        children = {}
+        for node, parent in zip(ids, parents):
+            children.setdefault(parent or '', []).append(node)
+        depth = self._tree_depth(children, '')
+        ring = 1.0 / max(depth, 1)
+
+        def draw(parent, level, start, span):
+            nodes = children.get(parent, [])
+            total = sum(values[node] for node in nodes)
+            if trace.branchvalues != 'total' and parent:
+                total += values.get(parent, 0)
+            angle = start
+            for i, node in enumerate(nodes):
+                node_span = span * values[node] / total if total else 0
+                color = to_mpl_color(colors.get(node, colorway[i % len(colorway)]))
+                inner = level * ring
+                ax.add_patch(Wedge((0, 0), inner + ring, angle, angle + node_span, width=ring,
+                                   facecolor=color, edgecolor=DEFAULT_BACKGROUND, linewidth=1))
+                if node_span > 12:
+                    middle = np.deg2rad(angle + node_span / 2)
+                    radius = inner + ring / 2
+                    ax.text(radius * np.cos(middle), radius * np.sin(middle), str(labels[node]),
+                            ha='center', va='center', color=text_color, fontsize=7)
+                draw(node, level + 1, angle, node_span)
+                angle += node_span
+
+        draw('', 0, 90, 360)
+        ax.set_xlim(-1.05, 1.05)
+        ax.set_ylim(-1.05, 1.05)
+
+    def _tree_depth(self, children, node):
+        """Number of rings below `node` in the sunburst tree."""
+        return max((1 + self._tree_depth(children, child) for child in children.get(node, [])), default=0)
+
+class KaleidoRenderer:
+    """In-process static export through Plotly's Kaleido engine (requires the kaleido package)."""
+
+    name = 'kaleido'
+
+    def __init__(self, width=CHART_WIDTH_PX, height=CHART_HEIGHT_PX):
+        self.width = width
+        self.height = height
+
+    def render(self, fig, chart_name):
+        """Render `fig` to PNG bytes."""
+        import plotly.io as pio
+        return pio.to_image(fig, format='png', width=self.width, height=self.height, engine='kaleido')
+
+    def close(self):
+        """Nothing to release; present for interface parity."""
+
+class SeleniumRenderer:
+    """Headless Chrome screenshot renderer, kept as an optional fallback.
+
+    The browser is started on first use and reused for every chart until close().
+    """
+
+    name = 'selenium'
+
+    def __init__(self, width=CHART_WIDTH_PX, height=CHART_HEIGHT_PX, page_timeout=10):
+        self.width = width
+        self.height = height
+        self.page_timeout = page_timeout
+        self.driver = None
+        self.tmp_dir = None
+
+    def _start(self):
+        from selenium import webdriver
+        from selenium.webdriver.chrome.service import Service
+        from webdriver_manager.chrome import ChromeDriverManager
+
+        options = webdriver.ChromeOptions()
+        options.add_argument('--headless')
+        options.add_argument('--disable-gpu')
+        options.add_argument('--no-sandbox')
+        options.add_argument('--disable-dev-shm-usage')
+        options.add_argument(f'--window-size={self.width},{self.height}')
+        self.driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def render(self, fig, chart_name):
+        """Render `fig` to PNG bytes."""
+        import plotly.io as pio
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions
+        from selenium.webdriver.support.ui import WebDriverWait
+
+        if self.driver is None:
+            self._start()
+        html_path = os.path.join(self.tmp_dir.name, f"{chart_name}.html")
+        pio.write_html(fig, file=html_path, auto_open=False)
+        self.driver.get(f"file://{html_path}")
+        WebDriverWait(self.driver, self.page_timeout).until(
+            expected_conditions.presence_of_element_located((By.CLASS_NAME, 'main-svg'))
+        )
+        return self.driver.get_screenshot_as_png()
+
+    def close(self):
+        """Quit the browser and remove temporary files."""
+        if self.driver is not None:
+            self.driver.quit()
+            self.driver = None
+        if self.tmp_dir is not None:
+            self.tmp_dir.cleanup()
+            self.tmp_dir = None
+
+RENDERERS = {
+    'matplotlib': MatplotlibRenderer,
+    'kaleido': KaleidoRenderer,
+    'selenium': SeleniumRenderer,
+}
+
+def create_renderer(name=None):
+    """Create a chart renderer by name (defaults to the CHART_RENDERER setting)."""
+    name = name or DEFAULT_RENDERER
+    if name not in RENDERERS:
+        raise ValueError(f"Unknown chart renderer '{name}'. Choose one of: {', '.join(RENDERERS)}")
+    return RENDERERS[name]()
+
+@traced()
+def render_with_fallback(renderer, fig, chart_name):
+    """Render with `renderer`, trying FALLBACK_RENDERER on failure; returns None if both fail."""
+    try:
+        return renderer.render(fig, chart_name)
+    except Exception as e:
+        logger.error(f"Error rendering chart {chart_name} to image: {str(e)}")
+    if FALLBACK_RENDERER and FALLBACK_RENDERER != renderer.name:
+        fallback = None
+        try:
+            fallback = create_renderer(FALLBACK_RENDERER)
+            return fallback.render(fig, chart_name)
+        except Exception as e:
+            logger.error(f"Fallback renderer failed for chart {chart_name}: {str(e)}")
+        finally:
+            if fallback is not None:
+                fallback.close()
+    return None
+
+# One renderer per pool worker and renderer name, created on the worker's first chart and reused
+_worker_state = threading.local()
+# Renderers of thread-pool workers by pool generation, closed when their pool is retired
+_thread_renderers = {}
+_thread_renderers_lock = threading.Lock()
+
+def _worker_renderer(name, generation=None):
+    renderers = getattr(_worker_state, 'renderers', None)
+    if renderers is None:
+        renderers = _worker_state.renderers = {}
+    renderer = renderers.get(name)
+    if renderer is None:
+        renderer = renderers[name] = create_renderer(name)
+        if generation is None:
+            # Pool processes exit without running atexit hooks; Finalize still runs
+            Finalize(renderer, renderer.close, exitpriority=10)
+        else:
+            with _thread_renderers_lock:
+                _thread_renderers.setdefault(generation, []).append(renderer)
+    return renderer
+
+def _render_in_thread(name, fig, chart_name, generation):
+    return render_with_fallback(_worker_renderer(name, generation), fig, chart_name)
+
+def _render_in_process(name, fig, chart_name):
+    return render_with_fallback(_worker_renderer(name), fig, chart_name)
+
+def _init_render_process():
+    # Own process group, so a hung worker can be killed together with its browser or Kaleido child
+    if hasattr(os, 'setpgrp'):
+        os.setpgrp()
+
+_render_pools = {}
+_render_pools_lock = threading.Lock()
+_thread_pool_generation = 0
+
+def _get_render_pool(executor, workers):
+    """Return the shared pool for `executor`, resizing it if the worker count changed.
+
+    Process pools use the spawn start method: forking the multi-threaded
+    Streamlit server can copy locks held by other threads into the worker.
+    """
+    global _thread_pool_generation
+    with _render_pools_lock:
+        pool, pool_workers, generation = _render_pools.get(executor, (None, 0, None))
+        if pool is None or pool_workers != workers:
+            if pool is not None:
+                _retire_pool(executor, pool, generation)
+            if executor == 'process':
+                pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                           initializer=_init_render_process)
+            else:
+                _thread_pool_generation += 1
+                generation = _thread_pool_generation
+                pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='chart-render')
+            _render_pools[executor] = (pool, workers, generation)
+        return pool, generation
+
+def _discard_render_pool(executor, pool):
+    """Drop a pool with timed-out charts so the next report starts a fresh one."""
+    with _render_pools_lock:
+        current = _render_pools.get(executor)
+        if current is None or current[0] is not pool:
+            return
+        del _render_pools[executor]
+    _retire_pool(executor, pool, current[2], kill=True)
+
+def _retire_pool(executor, pool, generation, kill=False):
+    """Shut a pool down without waiting for it.
+
+    With `kill`, process workers are killed together with their process
+    group. Threads cannot be killed, so a thread pool's renderers are closed
+    only after every chart still running on it has returned.
+    """
+    if executor == 'process':
+        processes = list((getattr(pool, '_processes', None) or {}).values())
+        pool.shutdown(wait=False, cancel_futures=True)
+        if kill:
+            for process in processes:
+                _kill_worker(process)
+        return
+    pool.shutdown(wait=False, cancel_futures=True)
+
+    def close_when_idle():
+        pool.shutdown(wait=True)
+        _close_thread_renderers(generation)
+
+    threading.Thread(target=close_when_idle, name='chart-render-retire', daemon=True).start()
+
+def _kill_worker(process):
+    if not process.is_alive():
+        return
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (AttributeError, OSError):
+        # No process groups here, or the worker has not run its initializer yet
+        process.kill()
+    logger.warning(f"Killed chart render worker {process.pid}")
+
+@atexit.register
+def _shutdown_render_pools():
+    with _render_pools_lock:
+        pools = list(_render_pools.items())
+        _render_pools.clear()
+    for executor, (pool, _, generation) in pools:
+        pool.shutdown(wait=False, cancel_futures=True)
+        if generation is not None:
+            _close_thread_renderers(generation)
+
+@traced()
+def render_charts(charts, renderer_name=None, workers=None, executor=None, timeout=None):
+    """Render [(fig, chart_name), ...] concurrently and return PNG bytes (or None) in input order.
+
+    Charts go to a pool kept for the life of the process, whose workers each
+    keep a single renderer for all the charts they draw. A chart that fails,
+    or is not finished within `timeout` seconds of its turn in the queue,
+    comes back as None; a pool with such a chart is replaced, and its process
+    workers are killed.
+    """
+    name = renderer_name or DEFAULT_RENDERER
+    workers = max(1, workers or RENDER_WORKERS)
+    executor = executor or RENDER_EXECUTOR
+    timeout = timeout or RENDER_TIMEOUT_SECONDS
+    if executor == 'process':
+        workers = min(workers, os.cpu_count() or 1)
+    waves = max(1, min(workers, len(charts)))
+    results = [None] * len(charts)
+    timed_out = False
+    started = time.monotonic()
+    pool, generation = _get_render_pool(executor, workers)
+    try:
+        futures = _submit_charts(pool, executor, generation, name, charts)
+    except RuntimeError:
+        # Retired by a concurrent report, or broken by a crashed worker
+        _discard_render_pool(executor, pool)
+        pool, generation = _get_render_pool(executor, workers)
+        futures = _submit_charts(pool, executor, generation, name, charts)
+    for i, (future, (_, chart_name)) in enumerate(zip(futures, charts)):
+        # Charts queue behind earlier ones, so the deadline grows with the chart's wave
+        deadline = started + timeout * (i // waves + 1)
+        try:
+            results[i] = future.result(timeout=max(0, deadline - time.monotonic()))
+        except FutureTimeoutError:
+            logger.error(f"Timed out rendering chart {chart_name} after {timeout:.0f} seconds")
+            if not future.cancel():
+                timed_out = True
+        except Exception as e:
+            logger.error(f"Error rendering chart {chart_name} to image: {str(e)}")
+    if timed_out:
+        _discard_render_pool(executor, pool)
+    return results
+
+def _submit_charts(pool, executor, generation, name, charts):
+    if executor == 'process':
+        return [pool.submit(_render_in_process, name, fig, chart_name) for fig, chart_name in charts]
+    return [pool.submit(in_context(_render_in_thread), name, fig, chart_name, generation) for fig, chart_name in charts]
+
+def _close_thread_renderers(generation):
+    with _thread_renderers_lock:
+        renderers = _thread_renderers.pop(generation, [])
+    for renderer in renderers:
+        try:
+            renderer.close()
+        except Exception as e:
+            logger.error(f"Error closing chart renderer: {str(e)}")
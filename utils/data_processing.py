@@ -1,36 +1,251 @@
+import atexit
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import tempfile
+import numpy as np
 import pandas as pd
+import pyarrow as pa
 import logging
+from pandas.tseries.api import guess_datetime_format
+from utils.tracing import traced
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_CHUNKSIZE = 100_000
+CLASSIFY_WORKERS = int(os.getenv("CLASSIFY_WORKERS", 1))
+# Smaller inputs are classified serially; shipping them to workers costs more than it saves
+MIN_SHARD_ROWS = 50_000
+# tmpfs, so the file workers map never touches disk; falls back to the temp dir elsewhere
+SHARED_MEMORY_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+def validate_columns(df):
+    """Ensure the required columns are present."""
+    if 'feedback' not in df.columns or 'date' not in df.columns:
+        raise ValueError("CSV must contain 'feedback' and 'date' columns")
+
+@traced()
 def load_data(uploaded_file):
     """Load and validate CSV file."""
     try:
         df = pd.read_csv(uploaded_file)
-        if 'feedback' not in df.columns or 'date' not in df.columns:
-            raise ValueError("CSV must contain 'feedback' and 'date' columns")
+        validate_columns(df)
         df['date'] = pd.to_datetime(df['date'])
         return df
     except Exception as e:
         logger.error(f"Error loading data: {str(e)}")
         raise
 
-def preprocess_data(df):
-    """Preprocess data: add sentiment and theme columns."""
-    from utils.nlp_analysis import analyze_sentiment, extract_themes
-    df['sentiment'] = df['feedback'].apply(analyze_sentiment)
-    themes = extract_themes(df)
-    df['theme'] = df['feedback'].apply(lambda x: next((k for k, v in themes.items() if any(kw in x.lower() for kw in v)), 'General'))
+@traced()
+def classify_feedback(df, matcher, workers=None):
+    """Add day, sentiment and theme columns using a prebuilt ThemeMatcher.
+
+    Sentiment and theme are categoricals with a fixed category order, and day is
+    the date normalized to midnight so filters and charts never recompute it.
+    With more than one worker (CLASSIFY_WORKERS by default) large inputs are
+    classified in shards across processes; the result is identical to the
+    serial path.
+    """
+    from utils.nlp_analysis import analyze_sentiment_batch, SENTIMENT_LABELS
+    workers = workers or CLASSIFY_WORKERS
+    day = df['date'].dt.normalize()
+    df['day'] = day.dt.tz_localize(None) if day.dt.tz is not None else day
+    if workers > 1 and len(df) >= 2 * MIN_SHARD_ROWS:
+        sentiment_codes, theme_codes = _classify_parallel(df['feedback'], matcher, workers)
+        df['sentiment'] = pd.Categorical.from_codes(sentiment_codes, categories=SENTIMENT_LABELS)
+        df['theme'] = pd.Categorical.from_codes(theme_codes, categories=matcher.labels)
+    else:
+        df['sentiment'] = analyze_sentiment_batch(df['feedback'])
+        df['theme'] = matcher.assign(df['feedback'])
     return df
 
-def filter_data(df, date_range, sentiments, themes):
-    """Apply filters to the dataframe."""
-    filtered_df = df.copy()
+_classify_pool = None
+_classify_pool_workers = 0
+_classify_pool_lock = threading.Lock()
+
+def _get_classify_pool(workers):
+    """Return the shared classification pool, resizing it if the worker count changed."""
+    global _classify_pool, _classify_pool_workers
+    with _classify_pool_lock:
+        if _classify_pool is None or _classify_pool_workers != workers:
+            if _classify_pool is not None:
+                _classify_pool.shutdown()
+            _classify_pool = ProcessPoolExecutor(max_workers=workers)
+            _classify_pool_workers = workers
+        return _classify_pool
+
+@atexit.register
+def _shutdown_classify_pool():
+    if _classify_pool is not None:
+        _classify_pool.shutdown(cancel_futures=True)
+
+def _classify_shard(path, start, stop, matcher):
+    """Worker: classify rows [start, stop) of the feedback column in a memory-mapped Arrow file."""
+    from utils.nlp_analysis import analyze_sentiment_batch
+    with pa.memory_map(path, 'r') as source:
+        column = pa.ipc.open_file(source).read_all().column(0).slice(start, stop - start)
+    feedback = pd.Series(pd.arrays.ArrowStringArray(column))
+    sentiment_codes = analyze_sentiment_batch(feedback).cat.codes.to_numpy()
+    theme_codes = matcher.assign(feedback).cat.codes.to_numpy()
+    return sentiment_codes, theme_codes
+
+def _classify_parallel(feedback, matcher, workers):
+    """Classify feedback in contiguous shards on the process pool; return (sentiment, theme) codes in row order.
+
+    The column is written once as an Arrow IPC file in shared memory, so workers
+    memory-map it instead of receiving pickled frames and only send back the
+    small category codes.
+    """
+    # Same string coercion as the serial classifiers, so numeric or mixed cells match them
+    column = pa.array(feedback.astype('string[pyarrow]').array).cast(pa.large_string())
+    table = pa.table({'feedback': column})
+    del column
+    fd, path = tempfile.mkstemp(suffix='.arrow', dir=SHARED_MEMORY_DIR)
+    os.close(fd)
+    try:
+        with pa.OSFile(path, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        del table
+        # A few shards per worker keeps them busy when some shards hold longer text
+        shards = min(workers * 4, max(1, len(feedback) // MIN_SHARD_ROWS))
+        bounds = np.linspace(0, len(feedback), shards + 1).astype(int)
+        pool = _get_classify_pool(workers)
+        futures = [pool.submit(_classify_shard, path, start, stop, matcher)
+                   for start, stop in zip(bounds[:-1], bounds[1:])]
+        results = [future.result() for future in futures]
+    finally:
+        os.remove(path)
+    logger.info(f"Classified {len(feedback)} rows in {shards} shards on {workers} workers")
+    return np.concatenate([r[0] for r in results]), np.concatenate([r[1] for r in results])
+
+@traced()
+def preprocess_data(df, workers=None):
+    """Preprocess data: add day, sentiment and theme columns."""
+    from utils.nlp_analysis import extract_themes, ThemeMatcher
+    themes = extract_themes(df)
+    return classify_feedback(df, ThemeMatcher(themes), workers=workers)
+
+@traced()
+def load_data_chunked(uploaded_file, chunksize=DEFAULT_CHUNKSIZE, workers=None):
+    """Load, validate and preprocess a CSV file in chunks of `chunksize` rows.
+
+    Each chunk has its dates parsed and is classified before the next one is
+    read, so the classifiers' temporary arrays only ever cover one chunk. The
+    classified chunks are kept and concatenated at the end, so peak memory is
+    still about twice the size of the result. The result matches load_data
+    followed by preprocess_data.
+    """
+    from utils.nlp_analysis import extract_themes, ThemeMatcher
+    try:
+        matcher = None
+        date_format = None
+        date_format_resolved = False
+        chunks = []
+        for chunk in pd.read_csv(uploaded_file, chunksize=chunksize):
+            if matcher is None:
+                validate_columns(chunk)
+                matcher = ThemeMatcher(extract_themes(chunk))
+            if not date_format_resolved:
+                # Mirror the single-read parse: one format guessed from the first date
+                first_date = chunk['date'].dropna()
+                if len(first_date):
+                    date_format_resolved = True
+                    if isinstance(first_date.iloc[0], str):
+                        date_format = guess_datetime_format(first_date.iloc[0])
+            chunk['date'] = pd.to_datetime(chunk['date'], format=date_format)
+            chunks.append(classify_feedback(chunk, matcher, workers=workers))
+        df = pd.concat(chunks, ignore_index=True)
+        logger.info(f"Loaded {len(df)} rows in chunks of {chunksize}")
+        return df
+    except Exception as e:
+        logger.error(f"Error loading data: {str(e)}")
+        raise
+
+def category_lookup(categories, values):
+    """Boolean table indexed by categorical code marking the selected values.
+
+    Has one extra trailing slot so missing values (code -1) look up False.
+    """
+    wanted = categories.get_indexer(list(values))
+    lookup = np.zeros(len(categories) + 1, dtype=bool)
+    lookup[wanted[wanted >= 0]] = True
+    return lookup
+
+def category_mask(series, values):
+    """Boolean mask of rows whose categorical value is in `values`, computed on codes."""
+    return category_lookup(series.cat.categories, values)[series.cat.codes.to_numpy()]
+
+class FilterIndex:
+    """Precomputed lookups for repeatedly filtering one preprocessed frame.
+
+    Day values are argsorted once so a date range resolves to a contiguous run
+    of positions by binary search, and sentiment/theme filters are checked on
+    categorical codes only for rows inside that run.
+    """
+
+    def __init__(self, df):
+        day = df['day'].to_numpy()
+        self.length = len(df)
+        self.order = np.argsort(day, kind='stable')
+        self.sorted_days = day[self.order]
+        # Chronological exports need no reordering, so date ranges become plain slices
+        self.is_sorted = bool((self.order == np.arange(self.length)).all())
+        self.codes = {column: df[column].cat.codes.to_numpy() for column in ('sentiment', 'theme')}
+        self.categories = {column: df[column].cat.categories for column in ('sentiment', 'theme')}
+        self.has_missing = {column: bool((codes < 0).any()) for column, codes in self.codes.items()}
+
+    @traced()
+    def positions(self, date_range, sentiments, themes):
+        """Return a row selector for df.iloc: a slice when rows are contiguous, else sorted positions."""
+        lo, hi = 0, self.length
+        if len(date_range) == 2:
+            lo = np.searchsorted(self.sorted_days, np.datetime64(date_range[0]), side='left')
+            hi = np.searchsorted(self.sorted_days, np.datetime64(date_range[1]), side='right')
+        lookups = [(column, self._lookup(column, values)) for column, values in (('sentiment', sentiments), ('theme', themes))]
+        lookups = [(column, lookup) for column, lookup in lookups if lookup is not None]
+        if self.is_sorted or (lo == 0 and hi == self.length):
+            if not lookups:
+                return slice(lo, hi)
+            mask = np.ones(hi - lo, dtype=bool)
+            for column, lookup in lookups:
+                mask &= lookup[self.codes[column][lo:hi]]
+            return lo + np.flatnonzero(mask)
+        if (hi - lo) * 4 > self.length:
+            # Wide ranges: scattering into a mask is cheaper than sorting positions
+            selected = np.zeros(self.length, dtype=bool)
+            selected[self.order[lo:hi]] = True
+            positions = np.flatnonzero(selected)
+        else:
+            positions = np.sort(self.order[lo:hi])
+        for column, lookup in lookups:
+            positions = positions[lookup[self.codes[column][positions]]]
+        return positions
+
+    def _lookup(self, column, values):
+        """Code lookup table for the selected values, or None when nothing is filtered out."""
+        if not values:
+            return None
+        lookup = category_lookup(self.categories[column], values)
+        if lookup[:-1].all() and not self.has_missing[column]:
+            return None
+        return lookup
+
+@traced()
+def filter_data(df, date_range, sentiments, themes, index=None):
+    """Apply filters to the dataframe.
+
+    Pass a FilterIndex built once for `df` to skip full-frame scans on repeated
+    calls; the result is then a view when the matching rows are contiguous.
+    """
+    if index is not None:
+        return df.iloc[index.positions(date_range, sentiments, themes)]
+    mask = np.ones(len(df), dtype=bool)
     if len(date_range) == 2:
-        filtered_df = filtered_df[(filtered_df['date'].dt.date >= date_range[0]) & 
-                                (filtered_df['date'].dt.date <= date_range[1])]
+        day = df['day'].to_numpy()
+        mask &= (day >= np.datetime64(date_range[0])) & (day <= np.datetime64(date_range[1]))
     if sentiments:
-        filtered_df = filtered_df[filtered_df['sentiment'].isin(sentiments)]
+        mask &= category_mask(df['sentiment'], sentiments)
     if themes:
-        filtered_df = filtered_df[filtered_df['theme'].isin(themes)]
-    return filtered_df
\ No newline at end of file
+        mask &= category_mask(df['theme'], themes)
+    return df[mask]
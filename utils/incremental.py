@@ -0,0 +1,204 @@
+import hashlib
+import json
+import logging
+import os
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from utils.aggregation import CUBE_DIMENSIONS, build_cube
+from utils.cache import CACHED_COLUMNS, pipeline_fingerprint
+from utils.data_processing import preprocess_data
+from utils.tracing import traced
+
+try:
+    import fcntl
+except ImportError:
+    # No advisory locks (Windows): only one writer may use a store directory at a time
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORE_DIR = os.getenv("FEEDBACK_STORE_DIR", os.path.join(".cache", "store"))
+META_FILE = 'meta.json'
+LOCK_FILE = 'store.lock'
+# Keys of earlier versions whose indexes can be extended with the rows appended since
+HISTORY_KEYS = 8
+
+@traced()
+def row_hashes(df):
+    """Stable 64-bit hash of each row's date and feedback."""
+    return pd.util.hash_pandas_object(df[['date', 'feedback']], index=False, categorize=False).to_numpy()
+
+def _write_arrow(path, table):
+    tmp_path = f"{path}.tmp"
+    with pa.OSFile(tmp_path, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+
+def _read_arrow(path):
+    with pa.memory_map(path, 'r') as source:
+        return pa.ipc.open_file(source).read_all()
+
+class FeedbackStore:
+    """Append-only store of classified feedback for cumulative daily exports.
+
+    Rows are identified by a hash of (date, feedback) plus their occurrence
+    number, so repeated identical rows are kept but a row already stored is
+    never classified again. Each append writes only the new rows as an Arrow
+    part and adds their counts to the persisted (day, theme, sentiment) cube.
+    meta.json is replaced last and names the current files, so an interrupted
+    append leaves the previous state intact. The store resets itself when the
+    preprocessing pipeline fingerprint changes.
+
+    Several processes may share a store: appends hold an exclusive lock and
+    re-read meta.json under it, reads hold a shared lock, and a superseded
+    cube or hash file is kept for one more version so a reader that has not
+    refreshed yet can still open it.
+    """
+
+    def __init__(self, root=DEFAULT_STORE_DIR):
+        self.root = root
+        self.meta = None
+        self.refresh()
+
+    def _path(self, name):
+        return os.path.join(self.root, name)
+
+    @contextmanager
+    def _locked(self, exclusive=False):
+        """Hold the store's advisory lock (shared for reads, exclusive for writes)."""
+        os.makedirs(self.root, exist_ok=True)
+        with open(self._path(LOCK_FILE), 'a') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            yield
+
+    def refresh(self):
+        """Pick up appends made by other sessions or processes since the last read."""
+        with self._locked(exclusive=True):
+            self.meta = self._read_meta()
+        return self
+
+    def _read_meta(self):
+        fingerprint = pipeline_fingerprint()
+        try:
+            with open(self._path(META_FILE)) as f:
+                meta = json.load(f)
+            if meta.get('fingerprint') == fingerprint:
+                return meta
+            logger.info("Preprocessing pipeline changed; resetting feedback store")
+            for name in meta['parts'] + [meta['hashes'], meta['cube']] + meta.get('superseded', []):
+                if name and os.path.exists(self._path(name)):
+                    os.remove(self._path(name))
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.error(f"Error reading feedback store metadata: {str(e)}")
+        return {'fingerprint': fingerprint, 'version': 0, 'rows': 0, 'parts': [], 'hashes': None, 'cube': None,
+                'superseded': [], 'history': []}
+
+    def __len__(self):
+        return self.meta['rows']
+
+    def key(self):
+        """Digest identifying the current contents, usable as a dataset cache key."""
+        return _meta_key(self.meta)
+
+    def history(self):
+        """Keys of earlier versions, newest first; their rows are a prefix of the current rows."""
+        return list(reversed(self.meta.get('history', [])))
+
+    def _hash_counts(self):
+        if not self.meta['hashes']:
+            return pd.Series(dtype=np.int64, index=pd.Index([], dtype=np.uint64))
+        with np.load(self._path(self.meta['hashes'])) as data:
+            return pd.Series(data['counts'], index=data['hashes'])
+
+    @traced()
+    def cube(self):
+        """Return the (day, theme, sentiment) counts of everything stored."""
+        if not self.meta['cube']:
+            return pd.DataFrame({column: [] for column in CUBE_DIMENSIONS + ['count']})
+        with self._locked():
+            return _read_arrow(self._path(self.meta['cube'])).to_pandas()
+
+    @traced()
+    def load(self):
+        """Return every stored row with the columns of a preprocessed frame."""
+        if not self.meta['parts']:
+            # Same columns and category order as stored rows, so callers need no special case
+            empty = pd.DataFrame({'date': pd.Series(dtype='datetime64[ns]'), 'feedback': pd.Series(dtype=object)})
+            return preprocess_data(empty)[CACHED_COLUMNS]
+        with self._locked():
+            tables = [_read_arrow(self._path(part)) for part in self.meta['parts']]
+        return pa.concat_tables(tables).to_pandas()
+
+    @traced()
+    def new_rows(self, df):
+        """Boolean mask of the rows in `df` not yet in the store."""
+        hashes = pd.Series(row_hashes(df))
+        occurrence = np.zeros(len(hashes), dtype=np.int64)
+        repeated = hashes.duplicated(keep=False).to_numpy()
+        if repeated.any():
+            occurrence[repeated] = hashes[repeated].groupby(hashes[repeated]).cumcount().to_numpy()
+        known = hashes.map(self._hash_counts()).fillna(0).to_numpy()
+        return occurrence >= known, hashes.to_numpy()
+
+    @traced()
+    def append(self, df):
+        """Classify and store the rows of a loaded export that are not stored yet.
+
+        Returns the number of new rows.
+        """
+        with self._locked(exclusive=True):
+            # Another session or process may have appended since this store was last read
+            self.meta = self._read_meta()
+            return self._append(df)
+
+    def _append(self, df):
+        mask, hashes = self.new_rows(df)
+        new = df[mask].reset_index(drop=True)
+        if not len(new):
+            logger.info(f"No new rows in export of {len(df)} rows")
+            return 0
+        new = preprocess_data(new)
+        version = self.meta['version'] + 1
+
+        part = f"part-{version:05d}.arrow"
+        _write_arrow(self._path(part), pa.Table.from_pandas(new[CACHED_COLUMNS], preserve_index=False))
+
+        counts = self._hash_counts().add(pd.Series(hashes[mask]).value_counts(), fill_value=0)
+        hash_file = f"hashes-{version:05d}.npz"
+        tmp_path = self._path(f"{hash_file}.tmp.npz")
+        np.savez(tmp_path, hashes=counts.index.to_numpy(dtype=np.uint64), counts=counts.to_numpy(dtype=np.int64))
+        os.replace(tmp_path, self._path(hash_file))
+
+        cube = build_cube(new)
+        if self.meta['cube']:
+            # Read directly: self.cube() would wait on the shared lock this append excludes
+            stored = _read_arrow(self._path(self.meta['cube'])).to_pandas()
+            cube = pd.concat([stored, cube], ignore_index=True)
+            cube = cube.groupby(CUBE_DIMENSIONS, observed=True)['count'].sum().reset_index()
+        cube_file = f"cube-{version:05d}.arrow"
+        _write_arrow(self._path(cube_file), pa.Table.from_pandas(cube, preserve_index=False))
+
+        previous = self.meta
+        superseded = [name for name in (previous['hashes'], previous['cube']) if name]
+        history = (previous.get('history', []) + [_meta_key(previous)])[-HISTORY_KEYS:] if previous['parts'] else []
+        self.meta = {**previous, 'version': version, 'rows': previous['rows'] + len(new),
+                     'parts': previous['parts'] + [part], 'hashes': hash_file, 'cube': cube_file,
+                     'superseded': superseded, 'history': history}
+        tmp_path = self._path(f"{META_FILE}.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(self.meta, f)
+        os.replace(tmp_path, self._path(META_FILE))
+        for name in previous.get('superseded', []):
+            if os.path.exists(self._path(name)):
+                os.remove(self._path(name))
+        logger.info(f"Appended {len(new)} new of {len(df)} rows; store holds {self.meta['rows']} rows")
+        return len(new)
+
+def _meta_key(meta):
+    return hashlib.sha256(json.dumps(meta, sort_keys=True).encode()).hexdigest()
@@ -0,0 +1,93 @@
+import atexit
+import logging
+import os
+import threading
+from utils.llm_cache import ResponseCache, make_cache_key, DEFAULT_TTL_SECONDS
+from utils.tracing import span, traced
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "llama-3.1-8b-instant"
+# Unset means the Groq SDK default; tests can point this at a local mock server
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL")
+MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", 10))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", 5))
+REQUEST_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT", 60))
+
+class LLMGateway:
+    """Long-lived Groq clients sharing one pooled, keep-alive HTTP connection pool.
+
+    Proxy environment variables are ignored through trust_env=False rather than
+    by editing os.environ. Completions are served from `cache` (a
+    ResponseCache) when an identical request was answered before.
+    """
+
+    def __init__(self, api_key, base_url=None, max_connections=MAX_CONNECTIONS,
+                 max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS, timeout=REQUEST_TIMEOUT_SECONDS, cache=None):
+        import httpx
+        from groq import Groq
+        self.cache = cache
+        self.base_url = base_url or GROQ_BASE_URL
+        limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive_connections)
+        self.http_client = httpx.Client(limits=limits, timeout=timeout, trust_env=False)
+        self.client = Groq(api_key=api_key, base_url=self.base_url, http_client=self.http_client, timeout=timeout)
+
+    @traced()
+    def complete(self, messages, max_tokens, temperature, model=DEFAULT_MODEL, template_version=None):
+        """Run a chat completion and return the message text, using the response cache if set."""
+        key = self._cache_key(messages, max_tokens, temperature, model, template_version)
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+        with span("llm_gateway.request", model=model, max_tokens=max_tokens):
+            response = self.client.chat.completions.create(
+                model=model, messages=messages, max_tokens=max_tokens, temperature=temperature
+            )
+        content = response.choices[0].message.content
+        if key is not None and content:
+            self.cache.put(key, content)
+        return content
+
+    def _cache_key(self, messages, max_tokens, temperature, model, template_version):
+        if self.cache is None:
+            return None
+        return make_cache_key(model, template_version, messages, temperature, max_tokens)
+
+    def close(self):
+        """Close the pooled connections."""
+        self.http_client.close()
+
+_gateways = {}
+_gateways_lock = threading.Lock()
+_response_cache = None
+
+def get_gateway(api_key, base_url=None):
+    """Return the process-wide gateway for this API key and endpoint, creating it once."""
+    global _response_cache
+    key = (api_key, base_url or GROQ_BASE_URL)
+    with _gateways_lock:
+        if key not in _gateways:
+            if _response_cache is None and DEFAULT_TTL_SECONDS > 0:
+                try:
+                    _response_cache = ResponseCache()
+                except Exception as e:
+                    logger.error(f"LLM response cache unavailable: {str(e)}")
+            _gateways[key] = LLMGateway(api_key, base_url=base_url, cache=_response_cache)
+            logger.info(f"Created pooled LLM client for {key[1] or 'default Groq endpoint'}")
+        return _gateways[key]
+
+@atexit.register
+def close_gateways():
+    """Close every gateway and the response cache at interpreter exit."""
+    with _gateways_lock:
+        gateways = list(_gateways.values())
+        _gateways.clear()
+    for gateway in gateways:
+        gateway.close()
+    if _response_cache is not None:
+        _response_cache.close()
+
+def cache_stats():
+    """Hit/miss counters of the shared response cache, or None if caching is off."""
+    return _response_cache.stats() if _response_cache is not None else None
@@ -1,79 +1,169 @@
-from groq import Groq
-import nltk
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
-from sklearn.feature_extraction.text import TfidfVectorizer
+import functools
 import logging
 import os
-import httpx
+import re
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from utils.tracing import traced
 
-# Download NLTK data with error handling
-try:
-    nltk.download('punkt', quiet=True)
-    nltk.download('stopwords', quiet=True)
-except Exception as e:
-    logging.error(f"Error downloading NLTK data: {str(e)}")
+logger = logging.getLogger(__name__)
 
-stop_words = set(stopwords.words('english'))
+# NLTK's English stopword list, bundled in the NLTK data layout so nothing is downloaded
+STOPWORDS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                              'nltk_data', 'corpora', 'stopwords', 'english')
 
-logger = logging.getLogger(__name__)
+@functools.lru_cache(maxsize=None)
+def get_stop_words():
+    """Return the bundled English stopwords, read on first use."""
+    with open(STOPWORDS_PATH, encoding='utf-8') as f:
+        return frozenset(line.strip() for line in f if line.strip())
+
+# Bump when a prompt template changes so cached LLM responses are not reused
+INSIGHTS_PROMPT_VERSION = 2
+QUESTION_PROMPT_VERSION = 3
+
+POSITIVE_KEYWORDS = ['great', 'amazing', 'satisfied', 'love', 'friendly']
+NEGATIVE_KEYWORDS = ['poor', 'bad', 'defective', 'unresponsive', 'messy']
+
+def compile_keyword_pattern(keywords):
+    """Compile a list of keywords into a single alternation regex."""
+    return re.compile('|'.join(re.escape(kw) for kw in keywords))
+
+THEME_KEYWORDS = {
+    'Service': ['service', 'staff', 'support', 'customer', 'friendly', 'unresponsive'],
+    'Product': ['product', 'item', 'quality', 'defective', 'collection'],
+    'Store': ['store', 'checkout', 'wait', 'messy', 'find'],
+    'Delivery': ['delivery', 'fast', 'shipping', 'discounts']
+}
+
+# Fixed category order for the sentiment column
+SENTIMENT_LABELS = ['Positive', 'Negative', 'Neutral']
+
+positive_pattern = compile_keyword_pattern(POSITIVE_KEYWORDS)
+negative_pattern = compile_keyword_pattern(NEGATIVE_KEYWORDS)
 
 def analyze_sentiment(text):
     """Analyze sentiment of feedback text (simplified)."""
     text = text.lower()
-    if any(word in text for word in ['great', 'amazing', 'satisfied', 'love', 'friendly']):
+    if positive_pattern.search(text):
         return 'Positive'
-    elif any(word in text for word in ['poor', 'bad', 'defective', 'unresponsive', 'messy']):
+    elif negative_pattern.search(text):
         return 'Negative'
     return 'Neutral'
 
+@traced()
+def analyze_sentiment_batch(feedback):
+    """Classify a whole Series of feedback in one vectorized pass.
+
+    Text is converted to Arrow-backed strings so lowercasing and keyword matching
+    run in native code. Gives the same Positive > Negative > Neutral precedence
+    as analyze_sentiment; missing feedback is classified as Neutral. Returns a
+    categorical Series with categories in SENTIMENT_LABELS order.
+    """
+    lowered = feedback.astype('string[pyarrow]').str.lower()
+    is_positive = lowered.str.contains(positive_pattern.pattern).to_numpy(dtype=bool, na_value=False)
+    is_negative = lowered.str.contains(negative_pattern.pattern).to_numpy(dtype=bool, na_value=False)
+    codes = np.where(is_positive, 0, np.where(is_negative, 1, 2))
+    return pd.Series(pd.Categorical.from_codes(codes, categories=SENTIMENT_LABELS), index=feedback.index, name='sentiment')
+
 def extract_themes(df):
-    """Extract themes and keywords using TF-IDF."""
-    vectorizer = TfidfVectorizer(stop_words=list(stop_words), max_features=100)
-    tfidf_matrix = vectorizer.fit_transform(df['feedback'])
-    feature_names = vectorizer.get_feature_names_out()
-    
-    themes = {
-        'Service': ['service', 'staff', 'support', 'customer', 'friendly', 'unresponsive'],
-        'Product': ['product', 'item', 'quality', 'defective', 'collection'],
-        'Store': ['store', 'checkout', 'wait', 'messy', 'find'],
-        'Delivery': ['delivery', 'fast', 'shipping', 'discounts']
-    }
-    
-    return themes
-
-def get_actionable_insights(df, api_key):
-    """Generate actionable insights using Groq LLM with optimized prompt."""
+    """Return the theme -> keywords dict used to assign themes.
+
+    Data-driven topics come from utils.topic_model.ThemeDiscovery.
+    """
+    return {theme: list(keywords) for theme, keywords in THEME_KEYWORDS.items()}
+
+class ThemeMatcher:
+    """Assign each feedback row the first theme (in dict order) whose keyword it contains.
+
+    Built once from a theme -> keywords dict. Keywords are kept in an inverted
+    index mapping each keyword to the first theme that lists it, so duplicates
+    across themes are only ever scanned once.
+    """
+
+    def __init__(self, themes, default='General'):
+        self.themes = list(themes)
+        self.default = default
+        self.labels = self.themes + [default]
+        self.keyword_rank = {}
+        for rank, keywords in enumerate(themes.values()):
+            for keyword in keywords:
+                self.keyword_rank.setdefault(keyword, rank)
+        ordered = sorted(self.keyword_rank, key=self.keyword_rank.get)
+        # Lookahead so overlapping keywords are all reported by findall
+        self.pattern = re.compile('(?=(' + '|'.join(re.escape(kw) for kw in ordered) + '))') if ordered else None
+        self._range_patterns = {}
+
+    def match(self, text):
+        """Return the theme for a single piece of text."""
+        if self.pattern is None:
+            return self.default
+        ranks = [self.keyword_rank[kw] for kw in self.pattern.findall(text.lower())]
+        return self.labels[min(ranks)] if ranks else self.default
+
+    @traced()
+    def assign(self, feedback):
+        """Assign themes to a whole Series of feedback as a categorical in theme order.
+
+        Each step runs one native regex pass over the keywords of half the
+        remaining candidate themes, so a row needs about log2(themes) passes
+        instead of one scan per theme and keyword.
+        """
+        text = pa.array(feedback.astype('string[pyarrow]').str.lower())
+        ranks = np.full(len(text), len(self.themes), dtype=np.int32)
+        self._bisect(text, np.arange(len(text)), 0, len(self.themes), ranks)
+        return pd.Series(pd.Categorical.from_codes(ranks, categories=self.labels), index=feedback.index, name='theme')
+
+    def _bisect(self, text, positions, lo, hi, ranks):
+        """Narrow the first matching theme of each row down to a single rank in [lo, hi]."""
+        if len(positions) == 0:
+            return
+        if lo == hi:
+            ranks[positions] = lo
+            return
+        mid = (lo + hi + 1) // 2
+        pattern = self._range_pattern(lo, mid)
+        if pattern is None:
+            self._bisect(text, positions, mid, hi, ranks)
+            return
+        subset = text if len(positions) == len(text) else text.take(pa.array(positions))
+        matched = pc.match_substring_regex(subset, pattern).fill_null(False).to_numpy(zero_copy_only=False)
+        self._bisect(text, positions[matched], lo, mid - 1, ranks)
+        self._bisect(text, positions[~matched], mid, hi, ranks)
+
+    def _range_pattern(self, lo, hi):
+        """Return the alternation regex for keywords of themes in [lo, hi), or None."""
+        if (lo, hi) not in self._range_patterns:
+            keywords = [kw for kw, rank in self.keyword_rank.items() if lo <= rank < hi]
+            self._range_patterns[(lo, hi)] = '|'.join(re.escape(kw) for kw in keywords) if keywords else None
+        return self._range_patterns[(lo, hi)]
+
+@traced()
+def get_actionable_insights(df, api_key, summary=None):
+    """Generate actionable insights using Groq LLM with optimized prompt.
+
+    `summary` is the summarize_feedback text of `df` when the caller already
+    has it; otherwise it is computed here.
+    """
+    from utils.llm_gateway import get_gateway
+    from utils.summarization import summarize_feedback
     try:
         if not api_key:
             raise ValueError("GROQ_API_KEY is not set. Please configure it in the .env file.")
-        
-        # Explicitly disable proxy settings in the environment
-        os.environ.pop("HTTP_PROXY", None)
-        os.environ.pop("HTTPS_PROXY", None)
-        
-        # Log the environment to debug
-        logger.debug("Environment variables before Groq client init: HTTP_PROXY=%s, HTTPS_PROXY=%s", 
-                     os.environ.get("HTTP_PROXY", "Not set"), os.environ.get("HTTPS_PROXY", "Not set"))
-        logger.debug("Groq API key: %s", api_key[:5] + "..." if api_key else "Not set")
-
-        # Create an httpx client with proxies explicitly disabled
-        http_client = httpx.Client(proxies=None)
-        
-        # Initialize Groq client with the custom httpx client
-        client = Groq(api_key=api_key, http_client=http_client)
-        feedback_data = df['feedback'].head(20).to_list()
-        prompt = f"""You are a retail business consultant specializing in customer feedback analysis. Analyze the following feedback data:\n{feedback_data}\nProvide 3 highly specific, actionable, and practical insights to improve customer experience in a retail setting. Focus on strategies like staff training, inventory management, store layout optimization, or customer service improvements. Format your response as a concise bulleted list."""
-        response = client.chat.completions.create(
-            model="llama-3.1-8b-instant",  # Updated to a supported model
+
+        feedback_data = summary if summary is not None else summarize_feedback(df, api_key)[0]
+        prompt = f"""You are a retail business consultant specializing in customer feedback analysis. Analyze the following feedback data, covering {len(df)} comments:\n{feedback_data}\nProvide 3 highly specific, actionable, and practical insights to improve customer experience in a retail setting. Focus on strategies like staff training, inventory management, store layout optimization, or customer service improvements. Format your response as a concise bulleted list."""
+        insights = get_gateway(api_key).complete(
             messages=[
                 {"role": "system", "content": "You are a retail business consultant providing actionable insights."},
                 {"role": "user", "content": prompt}
             ],
             max_tokens=300,
-            temperature=0.5
+            temperature=0.5,
+            template_version=INSIGHTS_PROMPT_VERSION
         )
-        insights = response.choices[0].message.content
         # Format insights as HTML bullet points
         insights = insights.strip()
         if not insights.startswith('-'):
@@ -83,42 +173,54 @@ def get_actionable_insights(df, api_key):
         logger.error(f"Error generating insights: {str(e)}")
         return "<ul><li>Unable to generate insights due to an error: Ensure GROQ_API_KEY is correctly set and the Groq API is accessible.</li></ul>"
 
-def search_feedback(df, query):
-    """Search feedback for a query."""
-    return df[df['feedback'].str.contains(query, case=False, na=False)]
+@traced()
+def search_feedback(df, query, index=None):
+    """Search feedback for a query.
 
-def answer_custom_question(df, question, api_key):
-    """Answer a custom question using Groq LLM with optimized prompt."""
+    With a SearchIndex over the full dataset (`df` being a row subset that keeps
+    its positional index), matches are ranked by BM25 and the query may use
+    AND (spaces), OR, "phrases" and prefix* terms. Otherwise, or when the query
+    has no searchable words, it is matched as a literal substring.
+    """
+    if index is not None:
+        positions = index.search(query, df['feedback'])
+        if positions is not None:
+            return df.loc[positions]
+    return df[df['feedback'].str.contains(query, case=False, na=False, regex=False)]
+
+@traced()
+def answer_custom_question(df, question, api_key, index=None, summary=None):
+    """Answer a custom question using Groq LLM with optimized prompt.
+
+    The prompt combines an overview of `df` (`summary`, the summarize_feedback
+    text, computed here when omitted) with the comments most relevant to the
+    question. `index` is a RetrievalIndex over the full dataset, with `df` a
+    row subset of it that keeps the dataset's positional index; without one,
+    a temporary index is built over `df`.
+    """
+    from utils.llm_gateway import get_gateway
+    from utils.retrieval import RetrievalIndex
+    from utils.summarization import summarize_feedback
     try:
         if not api_key:
             raise ValueError("GROQ_API_KEY is not set. Please configure it in the .env file.")
-        
-        # Explicitly disable proxy settings in the environment
-        os.environ.pop("HTTP_PROXY", None)
-        os.environ.pop("HTTPS_PROXY", None)
-        
-        # Log the environment to debug
-        logger.debug("Environment variables before Groq client init: HTTP_PROXY=%s, HTTPS_PROXY=%s", 
-                     os.environ.get("HTTP_PROXY", "Not set"), os.environ.get("HTTPS_PROXY", "Not set"))
-        logger.debug("Groq API key: %s", api_key[:5] + "..." if api_key else "Not set")
-
-        # Create an httpx client with proxies explicitly disabled
-        http_client = httpx.Client(proxies=None)
-        
-        # Initialize Groq client with the custom httpx client
-        client = Groq(api_key=api_key, http_client=http_client)
-        feedback_data = df['feedback'].head(20).to_list()
-        prompt = f"""You are a retail customer feedback analysis expert. Based on the following feedback data:\n{feedback_data}\nAnswer the following question in a concise, accurate, and professional manner, focusing on the specific details requested:\n{question}"""
-        response = client.chat.completions.create(
-            model="llama-3.1-8b-instant",  # Updated to a supported model
+
+        feedback_data = summary if summary is not None else summarize_feedback(df, api_key)[0]
+        if index is None:
+            relevant = df['feedback'].iloc[RetrievalIndex.build(df['feedback']).search(question)]
+        else:
+            relevant = df['feedback'].loc[index.search(question, rows=df.index.to_numpy())]
+        relevant_data = '\n'.join(f"- {comment}" for comment in relevant)
+        prompt = f"""You are a retail customer feedback analysis expert. Based on the following feedback data, covering {len(df)} comments:\n{feedback_data}\nComments most relevant to the question:\n{relevant_data}\nAnswer the following question in a concise, accurate, and professional manner, focusing on the specific details requested:\n{question}"""
+        answer = get_gateway(api_key).complete(
             messages=[
                 {"role": "system", "content": "You are a retail feedback analyst providing precise and relevant answers."},
                 {"role": "user", "content": prompt}
             ],
             max_tokens=500,
-            temperature=0.5
+            temperature=0.5,
+            template_version=QUESTION_PROMPT_VERSION
         )
-        answer = response.choices[0].message.content
         return answer if answer else "No relevant answer could be generated."
     except Exception as e:
         logger.error(f"Error answering question: {str(e)}")
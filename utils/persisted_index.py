@@ -0,0 +1,66 @@
+import logging
+import os
+from abc import ABC, abstractmethod
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class PersistedIndex(ABC):
+    """Base for per-dataset indexes saved next to the cached dataset.
+
+    Subclasses set `suffix` and bump `version` whenever their layout or
+    settings change so stale files are rebuilt.
+    """
+
+    suffix = None
+    version = 1
+
+    @classmethod
+    @abstractmethod
+    def build(cls, data):
+        """Build the index over `data` from scratch."""
+
+    @abstractmethod
+    def __len__(self):
+        """Number of rows the index covers."""
+
+    def extend(self, data):
+        """Return an index over `data`, whose first len(self) rows this index already covers.
+
+        Subclasses fold in only the new rows; the default rebuilds from scratch.
+        """
+        return self.build(data)
+
+    def save(self, path):
+        """Persist the index atomically."""
+        import joblib
+        tmp_path = f"{path}.tmp"
+        joblib.dump({'version': self.version, 'index': self}, tmp_path)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Load a saved index, or return None if it is missing, unreadable or outdated."""
+        if not os.path.exists(path):
+            return None
+        import joblib
+        try:
+            state = joblib.load(path)
+            if state.get('version') != cls.version or not isinstance(state.get('index'), cls):
+                return None
+            return state['index']
+        except Exception as e:
+            logger.error(f"Error reading index {path}: {str(e)}")
+            return None
+
+def merge_vocabularies(terms, new_terms):
+    """Sorted union of two term arrays and the column each input term maps to in it."""
+    merged = np.union1d(np.asarray(terms, dtype=object), np.asarray(new_terms, dtype=object))
+    return merged, np.searchsorted(merged, terms), np.searchsorted(merged, new_terms)
+
+def remap_columns(matrix, columns, n_columns):
+    """Move column i of a sparse matrix to columns[i] in a matrix with n_columns columns."""
+    import scipy.sparse as sp
+    coo = matrix.tocoo()
+    return sp.coo_matrix((coo.data, (coo.row, np.asarray(columns, dtype=np.int64)[coo.col])),
+                         shape=(matrix.shape[0], n_columns))
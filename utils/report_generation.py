@@ -6,14 +6,9 @@ from reportlab.lib.units import inch
 from io import BytesIO
 import logging
 import io
-import plotly.io as pio
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
-import os
-import time
-import tempfile
 from datetime import datetime
+from utils.chart_rendering import render_charts
+from utils.tracing import traced
 
 logger = logging.getLogger(__name__)
 
@@ -33,35 +28,6 @@ styles.add(ParagraphStyle(name='CustomBodyText', fontSize=10, leading=12, textCo
 styles.add(ParagraphStyle(name='InsightText', fontSize=10, leading=12, textColor=colors.black, backColor=light_gray, borderPadding=5, borderWidth=1, borderColor=header_blue, spaceAfter=6))
 styles.add(ParagraphStyle(name='HighImpactInsight', fontSize=10, leading=12, textColor=colors.black, backColor=light_gray, borderPadding=5, borderWidth=2, borderColor=highlight_red, spaceAfter=6))
 
-def render_chart_to_image(fig, chart_name):
-    """Render a Plotly chart to an image using Selenium with a headless browser."""
-    try:
-        with tempfile.TemporaryDirectory() as tmp_dir:
-            html_path = os.path.join(tmp_dir, f"{chart_name}.html")
-            pio.write_html(fig, file=html_path, auto_open=False)
-
-            options = webdriver.ChromeOptions()
-            options.add_argument('--headless')
-            options.add_argument('--disable-gpu')
-            options.add_argument('--no-sandbox')
-            options.add_argument('--disable-dev-shm-usage')
-            options.add_argument('--window-size=800,400')
-
-            driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
-            driver.get(f"file://{html_path}")
-            time.sleep(1)
-            img_path = os.path.join(tmp_dir, f"{chart_name}.png")
-            driver.save_screenshot(img_path)
-            driver.quit()
-
-            with open(img_path, 'rb') as f:
-                img_data = f.read()
-
-            return img_data
-    except Exception as e:
-        logger.error(f"Error rendering chart {chart_name} to image: {str(e)}")
-        return None
-
 def create_cover_page():
     """Create a professional cover page for the report."""
     elements = []
@@ -182,8 +148,16 @@ def create_credits_section():
     elements.append(Paragraph("Access the Tool: [Link Placeholder - Customer Feedback Synthesizer Dashboard]", styles['CustomBodyText']))
     return elements
 
-def generate_pdf_report(df, donut_fig, line_fig, bar_fig, hist_fig, scatter_fig, sunburst_fig, pos_wc, neg_wc, themes, insights):
-    """Generate a professional, creative, and stunning PDF report."""
+@traced()
+def generate_pdf_report(df, donut_fig, line_fig, bar_fig, hist_fig, scatter_fig, sunburst_fig, pos_wc, neg_wc, themes, insights,
+                        renderer_name=None, render_workers=None, discovered_themes=None, render_executor=None):
+    """Generate a professional, creative, and stunning PDF report.
+
+    Charts are rendered concurrently by a pool of `render_workers` workers
+    (CHART_RENDER_WORKERS by default) of kind `render_executor` ('process' or
+    'thread', CHART_RENDER_EXECUTOR by default). `discovered_themes` is an optional
+    topic name -> keywords dict from ThemeDiscovery.themes().
+    """
     buffer = BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=letter, leftMargin=0.5*inch, rightMargin=0.5*inch, topMargin=0.5*inch, bottomMargin=0.5*inch)
     story = []
@@ -203,24 +177,26 @@ def generate_pdf_report(df, donut_fig, line_fig, bar_fig, hist_fig, scatter_fig,
 
     # Sentiment Analysis Section
     story.append(Paragraph("📊 Sentiment Analysis", styles['SectionHeader']))
-    for fig, title in [
+    charts = [
         (donut_fig, "Sentiment Distribution"),
         (line_fig, "Sentiment Trend"),
         (bar_fig, "Theme Distribution"),
         (hist_fig, "Sentiment per Theme"),
         (scatter_fig, "Priority Matrix"),
         (sunburst_fig, "Sentiment by Theme (Sunburst)")
-    ]:
+    ]
+    images = render_charts([(fig, title.lower().replace(" ", "_")) for fig, title in charts],
+                           renderer_name=renderer_name, workers=render_workers, executor=render_executor)
+    for (fig, title), img_data in zip(charts, images):
         try:
-            chart_name = title.lower().replace(" ", "_")
-            img_data = render_chart_to_image(fig, chart_name)
-            if img_data:
-                img_buffer = BytesIO(img_data)
-                img_buffer.seek(0)
-                buffers.append(img_buffer)
-                story.append(Paragraph(title, styles['SubHeader']))
-                story.append(Image(img_buffer, width=6*inch, height=3*inch))
-                story.append(Spacer(1, 0.1 * inch))
+            if not img_data:
+                raise ValueError("chart could not be rendered")
+            img_buffer = BytesIO(img_data)
+            img_buffer.seek(0)
+            buffers.append(img_buffer)
+            story.append(Paragraph(title, styles['SubHeader']))
+            story.append(Image(img_buffer, width=6*inch, height=3*inch))
+            story.append(Spacer(1, 0.1 * inch))
         except Exception as e:
             logger.error(f"Error including {title}: {str(e)}")
             story.append(Paragraph(f"Error: Unable to include {title} chart in report.", styles['CustomBodyText']))
@@ -263,6 +239,10 @@ def generate_pdf_report(df, donut_fig, line_fig, bar_fig, hist_fig, scatter_fig,
             story.append(Paragraph(f"<b>{theme}</b>: {', '.join(keywords)}", styles['CustomBodyText']))
     else:
         story.append(Paragraph("Error: Themes data is not in the expected format.", styles['CustomBodyText']))
+    if discovered_themes:
+        story.append(Paragraph("Discovered Topics", styles['SubHeader']))
+        for topic, keywords in discovered_themes.items():
+            story.append(Paragraph(f"<b>{topic}</b>: {', '.join(keywords)}", styles['CustomBodyText']))
     story.append(Spacer(1, 0.2 * inch))
 
     # Actionable Insights
@@ -0,0 +1,109 @@
+import logging
+import os
+import numpy as np
+from utils.persisted_index import PersistedIndex
+from utils.tracing import span, traced
+
+logger = logging.getLogger(__name__)
+
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", 30))
+
+class RetrievalIndex(PersistedIndex):
+    """TF-IDF vectors of every feedback row for question-driven context retrieval.
+
+    The matrix is kept column-major (CSC), so scoring a query only touches the
+    posting lists of its terms, which acts as an exact inverted-index search.
+    Rows are addressed by position in the frame the index was built from.
+    """
+
+    suffix = '.tfidf.joblib'
+
+    def __init__(self, vectorizer, matrix):
+        self.vectorizer = vectorizer
+        self.matrix = matrix
+
+    @classmethod
+    @traced()
+    def build(cls, feedback):
+        """Fit TF-IDF over a feedback Series."""
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        vectorizer = TfidfVectorizer(stop_words='english', sublinear_tf=True, dtype=np.float32)
+        matrix = vectorizer.fit_transform(feedback.fillna('').astype(str)).tocsc()
+        logger.info(f"Built retrieval index over {matrix.shape[0]} rows and {matrix.shape[1]} terms")
+        return cls(vectorizer, matrix)
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    @traced()
+    def extend(self, feedback):
+        """Add the rows after len(self) using the fitted vocabulary and IDF weights.
+
+        Terms first seen in the new rows are not scored, so the index is refit
+        once the data has doubled since the last fit; refits therefore stay
+        proportional to the rows appended over time.
+        """
+        import scipy.sparse as sp
+        if len(feedback) >= 2 * len(self):
+            return self.build(feedback)
+        new = self.vectorizer.transform(feedback.iloc[len(self):].fillna('').astype(str))
+        return type(self)(self.vectorizer, sp.vstack([self.matrix, new]).tocsc())
+
+    def scores(self, query):
+        """Cosine similarity between the query and every row."""
+        query_vector = self.vectorizer.transform([query])
+        if query_vector.nnz == 0:
+            return np.zeros(len(self), dtype=np.float32)
+        return np.asarray(self.matrix[:, query_vector.indices] @ query_vector.data).ravel()
+
+    @traced()
+    def search(self, query, k=RETRIEVAL_TOP_K, rows=None):
+        """Return positions of the top-k rows by similarity, best first.
+
+        `rows` restricts the search to these positions (e.g. the filtered rows).
+        Rows with no term in common with the query are never returned.
+        """
+        scores = self.scores(query)
+        candidates = np.arange(len(scores)) if rows is None else np.asarray(rows)
+        candidate_scores = scores[candidates]
+        matched = np.flatnonzero(candidate_scores > 0)
+        if len(matched) > k:
+            matched = matched[np.argpartition(candidate_scores[matched], -k)[-k:]]
+        best = matched[np.argsort(-candidate_scores[matched], kind='stable')]
+        return candidates[best]
+
+def load_or_build_index(cache, key, data, index_cls=None, base_keys=()):
+    """Return the index stored next to the cached dataset, building it on a miss.
+
+    `index_cls` is a PersistedIndex subclass (RetrievalIndex by default) whose
+    `build(data)` takes `data`, usually the feedback Series; a stored index is
+    reused only if it covers len(data) rows. `base_keys` name earlier datasets
+    whose rows are a prefix of `data` (e.g. earlier versions of the feedback
+    store); on a miss the newest stored index among them is extended with the
+    remaining rows instead of being rebuilt.
+    """
+    index_cls = index_cls or RetrievalIndex
+    with span(f"retrieval.load_or_build_index.{index_cls.__name__}", rows_in=len(data)) as current:
+        path = cache.path_for(key, index_cls.suffix)
+        index = index_cls.load(path)
+        if index is not None and len(index) == len(data):
+            os.utime(path)
+            current.set(cached=True)
+            return index
+        current.set(cached=False)
+        index = None
+        for base_key in base_keys:
+            base = index_cls.load(cache.path_for(base_key, index_cls.suffix))
+            if base is not None and len(base) <= len(data):
+                current.set(extended_from=len(base))
+                index = base.extend(data)
+                break
+        if index is None:
+            index = index_cls.build(data)
+        try:
+            os.makedirs(cache.cache_dir, exist_ok=True)
+            index.save(path)
+            cache.evict(keep=path)
+        except Exception as e:
+            logger.error(f"Error writing {index_cls.__name__} for {key[:12]}: {str(e)}")
+        return index
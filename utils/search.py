@@ -0,0 +1,181 @@
+import logging
+import re
+import numpy as np
+from utils.persisted_index import PersistedIndex, merge_vocabularies, remap_columns
+from utils.tracing import traced
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = r"(?u)\b\w+\b"
+QUERY_PATTERN = re.compile(r'"([^"]*)"|(\S+)')
+BM25_K1 = 1.2
+BM25_B = 0.75
+MAX_SCORED_EXPANSIONS = 50
+
+def parse_query(query):
+    """Split a search query into OR-groups of AND-ed clauses.
+
+    Whitespace-separated clauses must all match; the word OR separates
+    alternatives. A clause is a "quoted phrase", a prefix ending in * or a
+    plain term. Returns a list of groups, each a list of (kind, text) pairs.
+    """
+    groups, current = [], []
+    for phrase, word in QUERY_PATTERN.findall(query):
+        if word == 'OR':
+            if current:
+                groups.append(current)
+            current = []
+        elif phrase:
+            current.append(('phrase', phrase))
+        elif word.endswith('*') and len(word) > 1:
+            current.append(('prefix', word[:-1]))
+        else:
+            current.append(('term', word))
+    if current:
+        groups.append(current)
+    return groups
+
+class SearchIndex(PersistedIndex):
+    """Inverted index over feedback tokens with BM25 ranking.
+
+    Term frequencies are kept in a CSC matrix whose columns are the posting
+    lists; the vocabulary is sorted so prefixes resolve to a contiguous range
+    of terms. Rows are addressed by position in the indexed frame.
+    """
+
+    suffix = '.search.joblib'
+
+    def __init__(self, vectorizer, matrix):
+        self.vectorizer = vectorizer
+        self.analyzer = vectorizer.build_analyzer()
+        self.matrix = matrix
+        self.terms = vectorizer.get_feature_names_out()
+        doc_lengths = np.asarray(matrix.sum(axis=1)).ravel()
+        # Per-row BM25 length normalisation, shared by every query
+        self.length_norm = (BM25_K1 * (1 - BM25_B + BM25_B * doc_lengths / max(doc_lengths.mean(), 1))).astype(np.float32)
+        document_frequency = np.diff(matrix.indptr)
+        self.idf = np.log1p((len(doc_lengths) - document_frequency + 0.5) / (document_frequency + 0.5)).astype(np.float32)
+
+    def __getstate__(self):
+        # The analyzer is a closure and is rebuilt from the vectorizer on load
+        state = self.__dict__.copy()
+        del state['analyzer']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.analyzer = self.vectorizer.build_analyzer()
+
+    @classmethod
+    @traced()
+    def build(cls, feedback):
+        """Index a feedback Series."""
+        from sklearn.feature_extraction.text import CountVectorizer
+        vectorizer = CountVectorizer(token_pattern=TOKEN_PATTERN, dtype=np.int32)
+        matrix = vectorizer.fit_transform(feedback.fillna('').astype(str)).tocsc()
+        matrix.sort_indices()
+        logger.info(f"Built search index over {matrix.shape[0]} rows and {matrix.shape[1]} terms")
+        return cls(vectorizer, matrix)
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    @traced()
+    def extend(self, feedback):
+        """Tokenize only the rows after len(self) and merge them into the postings.
+
+        New terms join the sorted vocabulary; BM25 statistics are recomputed
+        from the merged counts, so results match a full rebuild.
+        """
+        import scipy.sparse as sp
+        from sklearn.feature_extraction.text import CountVectorizer
+        vectorizer = CountVectorizer(token_pattern=TOKEN_PATTERN, dtype=np.int32)
+        try:
+            new = vectorizer.fit_transform(feedback.iloc[len(self):].fillna('').astype(str))
+        except ValueError:
+            # No tokens in the new rows
+            new = sp.csr_matrix((len(feedback) - len(self), 0), dtype=np.int32)
+            vectorizer.vocabulary_ = {}
+        terms, old_columns, new_columns = merge_vocabularies(self.terms, vectorizer.get_feature_names_out())
+        matrix = sp.vstack([remap_columns(self.matrix, old_columns, len(terms)),
+                            remap_columns(new, new_columns, len(terms))]).tocsc()
+        matrix.sort_indices()
+        vectorizer.vocabulary_ = {term: i for i, term in enumerate(terms)}
+        logger.info(f"Extended search index by {new.shape[0]} rows to {matrix.shape[0]} rows and {len(terms)} terms")
+        return type(self)(vectorizer, matrix)
+
+    def _term_ids(self, kind, token):
+        if kind == 'prefix':
+            lo = np.searchsorted(self.terms, token, side='left')
+            hi = np.searchsorted(self.terms, token + '\U0010ffff', side='left')
+            return list(range(lo, hi))
+        term_id = self.vectorizer.vocabulary_.get(token)
+        return [] if term_id is None else [term_id]
+
+    def _postings(self, term_ids):
+        if not term_ids:
+            return np.empty(0, dtype=np.int64)
+        rows = [self.matrix.indices[self.matrix.indptr[t]:self.matrix.indptr[t + 1]] for t in term_ids]
+        return rows[0] if len(rows) == 1 else np.unique(np.concatenate(rows))
+
+    def _match_clause(self, kind, text, feedback):
+        """Return (sorted matching positions, term ids to score), or (None, []) for no tokens."""
+        tokens = self.analyzer(text)
+        if not tokens:
+            return None, []
+        clauses = [self._term_ids('term', token) for token in tokens]
+        if kind == 'prefix':
+            clauses[-1] = self._term_ids('prefix', tokens[-1])
+        if any(not term_ids for term_ids in clauses):
+            return np.empty(0, dtype=np.int64), []
+        rows = self._postings(clauses[0])
+        for term_ids in clauses[1:]:
+            rows = np.intersect1d(rows, self._postings(term_ids), assume_unique=True)
+        if kind == 'phrase' and len(tokens) > 1 and len(rows):
+            # Postings have no positions, so verify word order on the candidates only
+            pattern = r'\b' + r'\W+'.join(re.escape(token) for token in tokens) + r'\b'
+            candidates = feedback.reindex(rows).dropna()
+            matched = candidates.astype(str).str.contains(pattern, case=False, regex=True)
+            rows = candidates.index[matched.to_numpy()].to_numpy()
+        if kind == 'prefix' and len(clauses[-1]) > MAX_SCORED_EXPANSIONS:
+            # Rank by the most common expansions only; matching still uses all of them
+            expansions = np.array(clauses[-1])
+            frequency = np.diff(self.matrix.indptr)[expansions]
+            clauses[-1] = expansions[np.argsort(-frequency, kind='stable')[:MAX_SCORED_EXPANSIONS]].tolist()
+        return rows, [term_id for term_ids in clauses for term_id in term_ids]
+
+    @traced()
+    def search(self, query, feedback):
+        """Return positions matching `query`, best BM25 score first.
+
+        `feedback` is the subset to search (e.g. filtered_df['feedback']) and
+        must keep the indexed frame's positional index. Returns None when the
+        query has no searchable tokens.
+        """
+        allowed = feedback.index.to_numpy()
+        matched, scored_terms, parsed = [], set(), False
+        for group in parse_query(query):
+            rows = None
+            for kind, text in group:
+                clause_rows, term_ids = self._match_clause(kind, text, feedback)
+                if clause_rows is None:
+                    continue
+                parsed = True
+                scored_terms.update(term_ids)
+                rows = clause_rows if rows is None else np.intersect1d(rows, clause_rows, assume_unique=True)
+            if rows is not None:
+                matched.append(rows)
+        if not parsed:
+            return None
+        rows = np.unique(np.concatenate(matched)) if matched else np.empty(0, dtype=np.int64)
+        rows = rows[np.isin(rows, allowed)]
+        scores = np.zeros(len(rows), dtype=np.float32)
+        for term_id in scored_terms:
+            start, end = self.matrix.indptr[term_id], self.matrix.indptr[term_id + 1]
+            postings = self.matrix.indices[start:end]
+            hit = np.searchsorted(postings, rows)
+            hit[hit == len(postings)] = 0
+            present = postings[hit] == rows
+            tf = self.matrix.data[start:end][hit[present]].astype(np.float32)
+            scores[present] += self.idf[term_id] * tf * (BM25_K1 + 1) / (tf + self.length_norm[rows[present]])
+        return rows[np.argsort(-scores, kind='stable')]
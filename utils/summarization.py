@@ -0,0 +1,139 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from utils.llm_gateway import get_gateway
+from utils.tracing import in_context, traced
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_CONCURRENCY = int(os.getenv("SUMMARY_CONCURRENCY", 4))
+# Prompt-token budgets: per segment, for the final prompt, and for one whole run
+SUMMARY_BUCKET_TOKENS = int(os.getenv("SUMMARY_BUCKET_TOKENS", 1500))
+SUMMARY_REDUCE_TOKENS = int(os.getenv("SUMMARY_REDUCE_TOKENS", 6000))
+SUMMARY_MAX_TOKENS = int(os.getenv("SUMMARY_MAX_TOKENS", 40000))
+SUMMARY_OUTPUT_TOKENS = 200
+MAX_COMMENT_CHARS = 500
+STRATA = ['theme', 'sentiment']
+# Fixed so the same data yields the same prompts and hits the LLM response cache
+SAMPLE_SEED = 0
+SUMMARY_PROMPT_VERSION = 1
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token for English text)."""
+    return len(text) // 4 + 1
+
+class TokenUsage:
+    """Thread-safe tally of estimated prompt and completion tokens across LLM calls."""
+
+    def __init__(self):
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self._lock = threading.Lock()
+
+    def record(self, messages, completion):
+        prompt = sum(estimate_tokens(m['content']) for m in messages)
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += prompt
+            self.completion_tokens += estimate_tokens(completion or '')
+
+    def __repr__(self):
+        return f"TokenUsage(calls={self.calls}, prompt={self.prompt_tokens}, completion={self.completion_tokens})"
+
+def sample_within_budget(feedback, token_budget):
+    """Pick comments in a fixed random order until their estimated tokens fill the budget."""
+    texts = feedback.astype(str).str.slice(0, MAX_COMMENT_CHARS)
+    order = np.random.default_rng(SAMPLE_SEED).permutation(len(texts))
+    tokens = texts.str.len().to_numpy()[order] // 4 + 2
+    taken = max(1, int(np.searchsorted(np.cumsum(tokens), token_budget, side='right')))
+    return texts.iloc[order[:taken]].tolist()
+
+@traced()
+def stratify(df, token_budget=SUMMARY_MAX_TOKENS, bucket_tokens=SUMMARY_BUCKET_TOKENS):
+    """Split feedback into theme x sentiment segments with a token-bounded sample of each.
+
+    Returns a list of dicts with the segment label, its row count and sampled comments,
+    largest segments first.
+    """
+    keys = [column for column in STRATA if column in df.columns]
+    groups = df.groupby(keys, observed=True, sort=False)['feedback'] if keys else [(('All',), df['feedback'])]
+    groups = [(key if isinstance(key, tuple) else (key,), feedback) for key, feedback in groups if len(feedback)]
+    per_bucket = max(1, min(bucket_tokens, token_budget // max(len(groups), 1)))
+    buckets = [{
+        'label': ' / '.join(str(part) for part in key),
+        'count': len(feedback),
+        'comments': sample_within_budget(feedback, per_bucket),
+    } for key, feedback in groups]
+    return sorted(buckets, key=lambda bucket: bucket['count'], reverse=True)
+
+def _complete(gateway, usage, messages, max_tokens):
+    content = gateway.complete(messages=messages, max_tokens=max_tokens, temperature=0.3,
+                               template_version=SUMMARY_PROMPT_VERSION)
+    usage.record(messages, content)
+    return content
+
+@traced()
+def summarize_bucket(gateway, usage, bucket, total):
+    """Map step: summarize the sampled comments of one segment."""
+    comments = '\n'.join(f"- {comment}" for comment in bucket['comments'])
+    prompt = (f"Segment: {bucket['label']} ({bucket['count']} of {total} comments, "
+              f"{len(bucket['comments'])} sampled below).\n{comments}\n"
+              "Summarize the recurring issues, praise and concrete details in this segment in at most 5 short bullet points.")
+    return _complete(gateway, usage, [
+        {"role": "system", "content": "You summarize retail customer feedback accurately and concisely."},
+        {"role": "user", "content": prompt}
+    ], SUMMARY_OUTPUT_TOKENS)
+
+def _combine(gateway, usage, sections):
+    prompt = ("Merge these customer feedback segment summaries into one summary of at most 8 bullet points, "
+              "keeping segment sizes in mind:\n\n" + '\n\n'.join(sections))
+    return _complete(gateway, usage, [
+        {"role": "system", "content": "You summarize retail customer feedback accurately and concisely."},
+        {"role": "user", "content": prompt}
+    ], SUMMARY_OUTPUT_TOKENS)
+
+def _reduce(gateway, usage, pool, sections, token_budget):
+    """Merge groups of sections until they fit in one final prompt."""
+    while len(sections) > 1 and sum(estimate_tokens(section) for section in sections) > token_budget:
+        groups, current, current_tokens = [], [], 0
+        for section in sections:
+            tokens = estimate_tokens(section)
+            if current and current_tokens + tokens > token_budget:
+                groups.append(current)
+                current, current_tokens = [], 0
+            current.append(section)
+            current_tokens += tokens
+        groups.append(current)
+        if len(groups) == len(sections):
+            # Each section alone exceeds the budget; merging would not shrink anything
+            break
+        futures = [pool.submit(in_context(_combine), gateway, usage, group) for group in groups]
+        sections = [future.result() for future in futures]
+    return sections
+
+@traced()
+def summarize_feedback(df, api_key, concurrency=SUMMARY_CONCURRENCY, token_budget=SUMMARY_MAX_TOKENS,
+                       reduce_tokens=SUMMARY_REDUCE_TOKENS):
+    """Condense the whole dataset into text that fits one LLM prompt.
+
+    Small datasets are returned verbatim. Larger ones are stratified by theme and
+    sentiment, each segment is summarized concurrently (map), and the summaries
+    are merged until they fit in `reduce_tokens` (reduce). Returns (text, usage).
+    """
+    usage = TokenUsage()
+    feedback = df['feedback'].astype(str)
+    if feedback.str.len().sum() // 4 + 2 * len(feedback) <= reduce_tokens:
+        return '\n'.join(f"- {comment}" for comment in feedback), usage
+    gateway = get_gateway(api_key)
+    buckets = stratify(df, token_budget=token_budget)
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix='summary') as pool:
+        futures = [pool.submit(in_context(summarize_bucket), gateway, usage, bucket, len(df)) for bucket in buckets]
+        summaries = [future.result() for future in futures]
+        sections = [f"[{bucket['label']}: {bucket['count']} comments]\n{summary}"
+                    for bucket, summary in zip(buckets, summaries) if summary]
+        sections = _reduce(gateway, usage, pool, sections, reduce_tokens)
+    logger.info(f"Summarized {len(df)} comments in {len(buckets)} segments: {usage}")
+    return '\n\n'.join(sections), usage
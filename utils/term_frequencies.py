@@ -0,0 +1,120 @@
+import logging
+import re
+import numpy as np
+import pandas as pd
+from utils.aggregation import CUBE_DIMENSIONS
+from utils.persisted_index import PersistedIndex, merge_vocabularies, remap_columns
+from utils.tracing import traced
+
+logger = logging.getLogger(__name__)
+
+# WordCloud draws at most this many words by default
+TOP_TERMS = 200
+TOKEN_PATTERN = r"(?u)\b\w\w+\b"
+
+def tokenizer_stop_words():
+    """The bundled stopwords plus the pieces the tokenizer splits them into (e.g. "don't" -> "don")."""
+    from utils.nlp_analysis import get_stop_words
+    stop_words = set(get_stop_words())
+    for word in list(stop_words):
+        stop_words.update(re.findall(TOKEN_PATTERN, word))
+    return sorted(stop_words)
+
+def _count_terms(feedback):
+    """Sorted terms and per-row term counts (CSR) of a feedback Series."""
+    import scipy.sparse as sp
+    from sklearn.feature_extraction.text import CountVectorizer
+    vectorizer = CountVectorizer(token_pattern=TOKEN_PATTERN, stop_words=tokenizer_stop_words(), dtype=np.int32)
+    try:
+        row_counts = vectorizer.fit_transform(feedback.fillna('').astype(str)).tocsr()
+        return vectorizer.get_feature_names_out(), row_counts
+    except ValueError:
+        # Nothing but stopwords or empty text
+        return np.array([], dtype=object), sp.csr_matrix((len(feedback), 0), dtype=np.int32)
+
+def _sum_cells(keys, counts):
+    """Group rows by (day, theme, sentiment) and sum their term counts.
+
+    `keys` and `counts` are matching lists of cell-key frames and count
+    matrices; their rows are stacked in order.
+    """
+    import scipy.sparse as sp
+    keys = keys[0] if len(keys) == 1 else pd.concat(keys, ignore_index=True)
+    counts = counts[0] if len(counts) == 1 else sp.vstack(counts).tocsr()
+    groups = keys.groupby(CUBE_DIMENSIONS, observed=True, sort=True)
+    cell_ids = groups.ngroup().to_numpy()
+    cells = groups.size().reset_index()[CUBE_DIMENSIONS]
+    membership = sp.csr_matrix((np.ones(len(keys), dtype=np.int32), (cell_ids, np.arange(len(keys)))),
+                               shape=(len(cells), len(keys)))
+    return cells, (membership @ counts).tocsr()
+
+class TermFrequencies(PersistedIndex):
+    """Term counts per row and per (day, theme, sentiment) cell, without stopwords.
+
+    Filters on date, sentiment and theme only sum the rows of the small cell
+    table, so their cost does not grow with the dataset; arbitrary row subsets
+    (e.g. search results) sum the per-row counts instead.
+    """
+
+    suffix = '.terms.joblib'
+
+    def __init__(self, terms, row_counts, row_sentiment, cells, cell_counts):
+        self.terms = terms
+        self.row_counts = row_counts
+        self.row_sentiment = row_sentiment
+        self.cells = cells
+        self.cell_counts = cell_counts
+
+    @classmethod
+    @traced()
+    def build(cls, df):
+        """Count terms in a preprocessed frame (needs feedback, day, theme and sentiment)."""
+        terms, row_counts = _count_terms(df['feedback'])
+        cells, cell_counts = _sum_cells([df[CUBE_DIMENSIONS]], [row_counts])
+        logger.info(f"Counted {len(terms)} terms over {len(df)} rows in {len(cells)} cells")
+        return cls(terms, row_counts, df['sentiment'].cat.codes.to_numpy(), cells, cell_counts)
+
+    @traced()
+    def extend(self, df):
+        """Count terms in the rows after len(self) only and merge them into the tables."""
+        import scipy.sparse as sp
+        new = df.iloc[len(self):]
+        new_terms, new_counts = _count_terms(new['feedback'])
+        terms, old_columns, new_columns = merge_vocabularies(self.terms, new_terms)
+        old_counts = remap_columns(self.row_counts, old_columns, len(terms)).tocsr()
+        new_counts = remap_columns(new_counts, new_columns, len(terms)).tocsr()
+        # Existing cells count as single rows carrying their summed counts
+        cells, cell_counts = _sum_cells(
+            [self.cells, new[CUBE_DIMENSIONS]],
+            [remap_columns(self.cell_counts, old_columns, len(terms)).tocsr(), new_counts])
+        logger.info(f"Counted {len(new_terms)} terms over {len(new)} new rows; {len(terms)} terms in {len(cells)} cells")
+        return type(self)(terms, sp.vstack([old_counts, new_counts]).tocsr(),
+                          np.concatenate([self.row_sentiment, new['sentiment'].cat.codes.to_numpy()]),
+                          cells, cell_counts)
+
+    def __len__(self):
+        return self.row_counts.shape[0]
+
+    @traced()
+    def frequencies(self, sentiment, date_range=(), sentiments=None, themes=None, rows=None, top=TOP_TERMS):
+        """Return {term: count} for the `top` most frequent terms of one sentiment.
+
+        Without `rows` the selection is the date range and sentiment/theme
+        filters (as in filter_data); with `rows` it is those positions.
+        """
+        from utils.data_processing import filter_data
+        if sentiments and sentiment not in sentiments:
+            return {}
+        if rows is not None:
+            rows = np.asarray(rows)
+            code = list(self.cells['sentiment'].cat.categories).index(sentiment)
+            counts = self.row_counts[rows[self.row_sentiment[rows] == code]].sum(axis=0)
+        else:
+            selected = filter_data(self.cells, date_range, [sentiment], themes)
+            counts = self.cell_counts[selected.index.to_numpy()].sum(axis=0)
+        counts = np.asarray(counts).ravel()
+        best = np.flatnonzero(counts)
+        if len(best) > top:
+            best = best[np.argpartition(counts[best], -top)[-top:]]
+        best = best[np.argsort(-counts[best], kind='stable')]
+        return {self.terms[i]: int(counts[i]) for i in best}
@@ -0,0 +1,97 @@
+import logging
+import os
+import numpy as np
+from utils.persisted_index import PersistedIndex
+from utils.tracing import traced
+
+logger = logging.getLogger(__name__)
+
+TOPIC_COUNT = int(os.getenv("TOPIC_COUNT", 8))
+TOPIC_VOCABULARY = 5000
+TOPIC_KEYWORDS = 8
+TOPIC_BATCH_SIZE = 4096
+# Rows drawn from each batch of new data; topics stabilise long before millions of rows
+TOPIC_SAMPLE_ROWS = int(os.getenv("TOPIC_SAMPLE_ROWS", 200_000))
+SAMPLE_SEED = 0
+
+def _sample(feedback, rows=TOPIC_SAMPLE_ROWS):
+    feedback = feedback.dropna().astype(str)
+    if len(feedback) > rows:
+        feedback = feedback.sample(rows, random_state=SAMPLE_SEED)
+    return feedback
+
+class ThemeDiscovery(PersistedIndex):
+    """Data-driven topics from TF-IDF and mini-batch NMF.
+
+    The vocabulary and IDF weights are fixed by the first fit; later data is
+    folded in with update(), which runs partial_fit over its TF-IDF rows. The
+    keyword themes in THEME_KEYWORDS still drive row assignment; these topics
+    describe what customers actually talk about.
+    """
+
+    suffix = '.topics.joblib'
+
+    def __init__(self, vectorizer, model, n_rows=0):
+        self.vectorizer = vectorizer
+        self.model = model
+        self.n_rows = n_rows
+
+    @classmethod
+    @traced()
+    def build(cls, feedback, n_topics=TOPIC_COUNT):
+        """Fit the vocabulary and topics on a feedback Series."""
+        from sklearn.decomposition import MiniBatchNMF
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        sample = _sample(feedback)
+        vectorizer = TfidfVectorizer(stop_words='english', max_features=TOPIC_VOCABULARY, max_df=0.5,
+                                     sublinear_tf=True, dtype=np.float32)
+        try:
+            vectorizer.fit(sample)
+        except ValueError as e:
+            logger.error(f"Error fitting topic vocabulary: {str(e)}")
+            return cls(None, None, len(feedback))
+        n_topics = max(1, min(n_topics, len(sample), len(vectorizer.vocabulary_)))
+        model = MiniBatchNMF(n_components=n_topics, batch_size=TOPIC_BATCH_SIZE, init='nndsvda', random_state=SAMPLE_SEED)
+        discovery = cls(vectorizer, model)
+        discovery.update(feedback, sample=sample)
+        return discovery
+
+    def __len__(self):
+        return self.n_rows
+
+    def extend(self, feedback):
+        """Fold the rows after len(self) into the topics."""
+        if self.model is None:
+            return self.build(feedback)
+        return self.update(feedback.iloc[len(self):])
+
+    @traced()
+    def update(self, feedback, sample=None):
+        """Fold new feedback into the topics without refitting from scratch."""
+        self.n_rows += len(feedback)
+        if self.model is None:
+            return self
+        sample = _sample(feedback) if sample is None else sample
+        matrix = self.vectorizer.transform(sample)
+        for offset in range(0, matrix.shape[0], TOPIC_BATCH_SIZE):
+            self.model.partial_fit(matrix[offset:offset + TOPIC_BATCH_SIZE])
+        logger.info(f"Updated {self.model.n_components} topics with {matrix.shape[0]} rows")
+        return self
+
+    @traced()
+    def themes(self, n_keywords=TOPIC_KEYWORDS):
+        """Return {topic name: top keywords}, strongest topics first.
+
+        Each topic is named after its two leading keywords.
+        """
+        if self.model is None or not hasattr(self.model, 'components_'):
+            return {}
+        terms = self.vectorizer.get_feature_names_out()
+        components = self.model.components_
+        themes = {}
+        for topic in np.argsort(-components.sum(axis=1), kind='stable'):
+            keywords = [terms[i] for i in np.argsort(-components[topic], kind='stable')[:n_keywords] if components[topic, i] > 0]
+            if keywords:
+                name = ' / '.join(keywords[:2]).title()
+                themes[name if name not in themes else f"{name} ({len(themes) + 1})"] = keywords
+        return themes
@@ -0,0 +1,260 @@
+import contextlib
+import contextvars
+import functools
+import io
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Append every finished span as a JSON line to this file when set
+TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT")
+# Comma-separated capture modes for profile(): "cprofile", "tracemalloc"
+TRACE_PROFILE = os.getenv("TRACE_PROFILE", "")
+HISTOGRAM_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, float('inf'))
+PROFILE_TOP_ENTRIES = 25
+
+class Span:
+    """One timed stage with optional attributes such as rows and bytes."""
+
+    __slots__ = ('name', 'start', 'duration', 'attrs', 'depth', 'thread')
+
+    def __init__(self, name, depth, attrs):
+        self.name = name
+        self.start = time.time()
+        self.duration = None
+        self.attrs = attrs
+        self.depth = depth
+        self.thread = threading.current_thread().name
+
+    def set(self, **attrs):
+        """Attach attributes (e.g. rows=..., bytes=...) to the span."""
+        self.attrs.update(attrs)
+
+    def to_dict(self):
+        return {'name': self.name, 'start': self.start, 'seconds': self.duration,
+                'depth': self.depth, 'thread': self.thread, **self.attrs}
+
+class Histogram:
+    """Cumulative latency histogram in Prometheus bucket layout."""
+
+    def __init__(self, buckets=HISTOGRAM_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.count += 1
+        self.sum += seconds
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                self.counts[i] += 1
+                break
+
+    def quantile(self, q):
+        """Upper bucket bound below which a fraction `q` of observations fall."""
+        target, seen = q * self.count, 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return self.buckets[-1]
+
+_local = threading.local()
+_lock = threading.Lock()
+_histograms = {}
+# Span lists of the collect() blocks enclosing the current context, innermost last
+_collectors = contextvars.ContextVar('trace_collectors', default=())
+# cProfile and tracemalloc are process-wide, so only one profile() captures at a time
+_profile_lock = threading.Lock()
+
+def _stack():
+    if not hasattr(_local, 'stack'):
+        _local.stack = []
+    return _local.stack
+
+def _finish(finished):
+    logger.debug(f"{finished.name} took {finished.duration:.3f} seconds")
+    with _lock:
+        histogram = _histograms.get(finished.name)
+        if histogram is None:
+            histogram = _histograms[finished.name] = Histogram()
+        histogram.observe(finished.duration)
+        for collector in _collectors.get():
+            collector.append(finished)
+        if TRACE_EXPORT_PATH:
+            try:
+                with open(TRACE_EXPORT_PATH, 'a') as f:
+                    f.write(json.dumps(finished.to_dict(), default=str) + '\n')
+            except OSError as e:
+                logger.error(f"Error exporting span {finished.name}: {str(e)}")
+
+@contextlib.contextmanager
+def span(name, **attrs):
+    """Time a block as a named stage; yields the Span so callers can attach attributes."""
+    stack = _stack()
+    current = Span(name, len(stack), attrs)
+    stack.append(current)
+    started = time.perf_counter()
+    try:
+        yield current
+    except Exception as e:
+        current.set(error=type(e).__name__)
+        raise
+    finally:
+        current.duration = time.perf_counter() - started
+        # Interleaved coroutines can finish out of order, so remove by identity
+        stack.remove(current)
+        _finish(current)
+
+def _size(value):
+    """Return (rows, bytes) of a frame, series, array or buffer, or (None, None)."""
+    if hasattr(value, 'memory_usage') and hasattr(value, 'shape'):
+        usage = value.memory_usage(index=False)
+        return len(value), int(usage.sum() if hasattr(usage, 'sum') else usage)
+    if hasattr(value, 'nbytes') and hasattr(value, 'shape'):
+        return len(value), int(value.nbytes)
+    if isinstance(value, (bytes, bytearray)):
+        return None, len(value)
+    if isinstance(value, io.BytesIO):
+        return None, value.getbuffer().nbytes
+    return None, None
+
+def traced(name=None):
+    """Decorator wrapping every call in a span named module.function.
+
+    Rows and bytes of the first frame/array argument and of the result are
+    attached as rows_in/bytes_in and rows_out/bytes_out.
+    """
+    def decorator(fn):
+        stage = name or f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage) as current:
+                for arg in args:
+                    rows, size = _size(arg)
+                    if size is not None:
+                        current.set(rows_in=rows, bytes_in=size)
+                        break
+                result = fn(*args, **kwargs)
+                rows, size = _size(result)
+                if size is not None:
+                    current.set(rows_out=rows, bytes_out=size)
+                return result
+        return wrapper
+    return decorator
+
+@contextlib.contextmanager
+def collect():
+    """Collect every span finished in this context while the block runs; yields the list.
+
+    Spans from worker threads are included when the work was submitted
+    through in_context(), so concurrent runs (e.g. dashboard sessions) each
+    see only their own spans.
+    """
+    spans = []
+    token = _collectors.set(_collectors.get() + (spans,))
+    try:
+        yield spans
+    finally:
+        _collectors.reset(token)
+
+def in_context(fn):
+    """Wrap `fn` to run in a copy of the caller's context, for submitting to a thread pool."""
+    return functools.partial(contextvars.copy_context().run, fn)
+
+def histogram_summary():
+    """Per-stage count, total, mean and approximate p50/p95 seconds."""
+    with _lock:
+        return [{'stage': stage, 'count': h.count, 'total_seconds': h.sum, 'mean_seconds': h.sum / h.count,
+                 'p50_seconds': h.quantile(0.5), 'p95_seconds': h.quantile(0.95)}
+                for stage, h in sorted(_histograms.items()) if h.count]
+
+def prometheus_text(metric='feedback_stage_duration_seconds'):
+    """Render the stage histograms in the Prometheus text exposition format."""
+    lines = [f"# HELP {metric} Latency of pipeline stages.", f"# TYPE {metric} histogram"]
+    with _lock:
+        for stage, h in sorted(_histograms.items()):
+            cumulative = 0
+            for bound, count in zip(h.buckets, h.counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{metric}_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+            lines.append(f'{metric}_sum{{stage="{stage}"}} {h.sum}')
+            lines.append(f'{metric}_count{{stage="{stage}"}} {h.count}')
+    return '\n'.join(lines) + '\n'
+
+def spans_to_jsonl(spans):
+    """Serialize spans as JSON lines."""
+    return ''.join(json.dumps(s.to_dict(), default=str) + '\n' for s in spans)
+
+class ProfileResult:
+    """Text reports from an opt-in profile() capture.
+
+    `skipped` is set when another capture was already running.
+    """
+
+    def __init__(self):
+        self.cprofile = None
+        self.tracemalloc = None
+        self.skipped = False
+
+@contextlib.contextmanager
+def profile(modes=None):
+    """Capture cProfile and/or tracemalloc reports for a block.
+
+    `modes` is an iterable of "cprofile"/"tracemalloc" (TRACE_PROFILE by
+    default); with no modes this adds no overhead and the reports stay None.
+    Both profilers are process-wide, so while another block is being
+    profiled this one runs unprofiled and the result is marked skipped.
+    """
+    if modes is None:
+        modes = [mode.strip() for mode in TRACE_PROFILE.split(',') if mode.strip()]
+    result = ProfileResult()
+    if not modes:
+        yield result
+        return
+    if not _profile_lock.acquire(blocking=False):
+        logger.info("Skipping profile capture; another run is being profiled")
+        result.skipped = True
+        yield result
+        return
+    try:
+        with _capture(modes, result):
+            yield result
+    finally:
+        _profile_lock.release()
+
+@contextlib.contextmanager
+def _capture(modes, result):
+    profiler = None
+    if 'cprofile' in modes:
+        import cProfile
+        profiler = cProfile.Profile()
+    tracing_memory = 'tracemalloc' in modes
+    if tracing_memory:
+        import tracemalloc
+        tracemalloc.start()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            import pstats
+            profiler.disable()
+            out = io.StringIO()
+            pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(PROFILE_TOP_ENTRIES)
+            result.cprofile = out.getvalue()
+        if tracing_memory:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            top = snapshot.statistics('lineno')[:PROFILE_TOP_ENTRIES]
+            result.tracemalloc = '\n'.join(
+                [f"current {current / 1e6:.1f} MB, peak {peak / 1e6:.1f} MB"] + [str(stat) for stat in top])
@@ -1,14 +1,16 @@
 import plotly.express as px
 import plotly.graph_objects as go
-from wordcloud import WordCloud
-import matplotlib.pyplot as plt
 import numpy as np
 import io
-from PIL import Image
+import threading
+from collections import OrderedDict
+from utils.aggregation import rollup, priority_matrix, sentiment_trend
+from utils.tracing import traced
 
-def create_donut_chart(df):
+@traced()
+def create_donut_chart(cube):
     """Create a donut chart for sentiment distribution."""
-    sentiment_counts = df['sentiment'].value_counts()
+    sentiment_counts = rollup(cube, 'sentiment').sort_values(ascending=False)
     fig = px.pie(
         values=sentiment_counts.values,
         names=sentiment_counts.index,
@@ -25,22 +27,27 @@ def create_donut_chart(df):
     fig.update_traces(textinfo='percent+label', textfont_size=16)
     return fig
 
-def create_line_chart(df):
-    """Create a line chart for sentiment trend over time."""
-    sentiment_trend = df.groupby([df['date'].dt.date, 'sentiment']).size().unstack(fill_value=0)
+@traced()
+def create_line_chart(cube, resolution='auto', rolling=None):
+    """Create a line chart for sentiment trend over time.
+
+    The daily cube is resampled to `resolution` ('day', 'week', 'month' or
+    'auto') and optionally smoothed by a `rolling` average over that many periods.
+    """
+    trend, resolution = sentiment_trend(cube, resolution, rolling)
     fig = go.Figure()
     colors = {'Positive': '#3b82f6', 'Negative': '#ef4444', 'Neutral': '#facc15'}
-    for sentiment in sentiment_trend.columns:
+    for sentiment in trend.columns:
         fig.add_trace(go.Scatter(
-            x=sentiment_trend.index,
-            y=sentiment_trend[sentiment],
+            x=trend.index,
+            y=trend[sentiment],
             name=sentiment,
             line=dict(width=3, color=colors[sentiment]),
             mode='lines+markers'
         ))
     fig.update_layout(
-        xaxis_title="Date",
-        yaxis_title="Count",
+        xaxis_title=resolution.capitalize(),
+        yaxis_title=f"Count ({rolling}-{resolution} average)" if rolling and rolling > 1 else "Count",
         showlegend=True,
         font=dict(color="#ffffff", size=14),
         paper_bgcolor="rgba(0,0,0,0)",
@@ -50,9 +57,10 @@ def create_line_chart(df):
     )
     return fig
 
-def create_bar_chart(df):
+@traced()
+def create_bar_chart(cube):
     """Create a bar chart for theme distribution."""
-    theme_counts = df['theme'].value_counts()
+    theme_counts = rollup(cube, 'theme').sort_values(ascending=False)
     fig = px.bar(
         x=theme_counts.index,
         y=theme_counts.values,
@@ -71,11 +79,15 @@ def create_bar_chart(df):
     fig.update_traces(marker_line_color='white', marker_line_width=1.5)
     return fig
 
-def create_histogram(df):
+@traced()
+def create_histogram(cube):
     """Create a histogram for sentiment per theme."""
+    theme_sentiment = rollup(cube, ['theme', 'sentiment']).reset_index().astype({'theme': str, 'sentiment': str})
     fig = px.histogram(
-        df,
+        theme_sentiment,
         x='theme',
+        y='count',
+        histfunc='sum',
         color='sentiment',
         barmode='group',
         color_discrete_sequence=['#3b82f6', '#ef4444', '#facc15']
@@ -91,13 +103,14 @@ def create_histogram(df):
     )
     return fig
 
-def create_scatter_plot(df):
-    """Create a scatter plot for priority matrix (impact vs frequency)."""
-    theme_counts = df['theme'].value_counts().reset_index()
-    theme_counts.columns = ['theme', 'frequency']
-    theme_counts['impact'] = theme_counts['theme'].apply(
-        lambda x: df[df['theme'] == x]['sentiment'].map({'Positive': 1, 'Neutral': 0, 'Negative': -1}).mean()
-    )
+@traced()
+def create_scatter_plot(cube, recency_half_life_days=None, show_confidence=False):
+    """Create a scatter plot for priority matrix (impact vs frequency).
+
+    Optionally weights impact towards recent feedback and draws confidence
+    intervals as error bars.
+    """
+    theme_counts = priority_matrix(cube, recency_half_life_days=recency_half_life_days)
     fig = px.scatter(
         theme_counts,
         x='frequency',
@@ -106,7 +119,8 @@ def create_scatter_plot(df):
         size='frequency',
         color='impact',
         color_continuous_scale='Plasma',
-        size_max=40
+        size_max=40,
+        error_y='margin' if show_confidence else None
     )
     fig.update_traces(textposition='top center', textfont=dict(color='#ffffff', size=14))
     fig.update_layout(
@@ -119,9 +133,10 @@ def create_scatter_plot(df):
     )
     return fig
 
-def create_sunburst_chart(df):
+@traced()
+def create_sunburst_chart(cube):
     """Create a sunburst chart for sentiment by theme."""
-    sunburst_data = df.groupby(['theme', 'sentiment']).size().reset_index(name='count')
+    sunburst_data = rollup(cube, ['theme', 'sentiment']).reset_index().astype({'theme': str, 'sentiment': str})
     fig = px.sunburst(
         sunburst_data,
         path=['theme', 'sentiment'],
@@ -137,36 +152,51 @@ def create_sunburst_chart(df):
     )
     return fig
 
-def create_wordcloud(df):
-    """Create word clouds for positive and negative feedback."""
-    pos_text = ' '.join(df[df['sentiment'] == 'Positive']['feedback'])
-    neg_text = ' '.join(df[df['sentiment'] == 'Negative']['feedback'])
-    
-    pos_wc = WordCloud(
-        width=400,
-        height=200,
-        background_color='rgba(0,0,0,0)',
-        colormap='Blues',
-        font_path=None,
-        min_font_size=10,
-        max_font_size=50
-    ).generate(pos_text if pos_text else 'No positive feedback')
-    
-    neg_wc = WordCloud(
+# Rendered word clouds keyed by their frequencies, so a repeated filter state skips layout
+WORDCLOUD_CACHE_SIZE = 32
+_wordcloud_cache = OrderedDict()
+_wordcloud_lock = threading.Lock()
+
+@traced()
+def render_wordcloud(frequencies, colormap, empty_text):
+    """Render a word cloud image from {term: count}, reusing cached images."""
+    from PIL import Image
+    from wordcloud import WordCloud
+    key = (colormap, empty_text, tuple(sorted(frequencies.items())))
+    with _wordcloud_lock:
+        if key in _wordcloud_cache:
+            _wordcloud_cache.move_to_end(key)
+            return _wordcloud_cache[key]
+    wc = WordCloud(
         width=400,
         height=200,
         background_color='rgba(0,0,0,0)',
-        colormap='Reds',
+        colormap=colormap,
         font_path=None,
         min_font_size=10,
         max_font_size=50
-    ).generate(neg_text if neg_text else 'No negative feedback')
-    
-    # Convert WordCloud to NumPy array and then to PIL Image
-    pos_array = pos_wc.to_array()
-    neg_array = neg_wc.to_array()
-    
-    pos_img = Image.fromarray(pos_array)
-    neg_img = Image.fromarray(neg_array)
-    
-    return pos_img, neg_img
\ No newline at end of file
+    )
+    wc = wc.generate_from_frequencies(frequencies) if frequencies else wc.generate(empty_text)
+    image = Image.fromarray(wc.to_array())
+    with _wordcloud_lock:
+        _wordcloud_cache[key] = image
+        if len(_wordcloud_cache) > WORDCLOUD_CACHE_SIZE:
+            _wordcloud_cache.popitem(last=False)
+    return image
+
+@traced()
+def create_wordcloud(df, frequencies=None):
+    """Create word clouds for positive and negative feedback.
+
+    `frequencies` is an optional (positive, negative) pair of {term: count}
+    dicts, e.g. from TermFrequencies.frequencies(); without it the terms of
+    `df` are counted here.
+    """
+    if frequencies is None:
+        from utils.term_frequencies import TermFrequencies
+        terms = TermFrequencies.build(df)
+        frequencies = (terms.frequencies('Positive'), terms.frequencies('Negative'))
+    pos_freq, neg_freq = frequencies
+    pos_img = render_wordcloud(pos_freq, 'Blues', 'No positive feedback')
+    neg_img = render_wordcloud(neg_freq, 'Reds', 'No negative feedback')
+    return pos_img, neg_img